@@ -0,0 +1,558 @@
+"""Offline benchmark for the archive pipeline.
+
+Runs the real stage functions from main.py against local stand-ins: an HTTP server
+for the YouTube Data API and SponsorBlock, and in-process fakes for Drive, Sheets
+and yt-dlp. Reports wall time, API calls and peak Python memory for each stage.
+
+    python bench.py --creators 3 --videos 2000 --clips 4 --json bench.json
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+from aiohttp import web
+import gspread
+from gspread.utils import a1_range_to_grid_range, numericise_all
+from googleapiclient.http import MediaUploadProgress
+
+from records import INDEX_HEADERS
+
+# Only the start and end markers are checked before upload, the rest stands in for image data
+THUMBNAIL = b'\xff\xd8' + os.urandom(40 * 1024) + b'\xff\xd9'
+
+calls = Counter()
+calls_lock = threading.Lock()
+
+def count(name: str):
+    with calls_lock:
+        calls[name] += 1
+
+def video_id(key: str, n: int) -> str:
+    return base64.urlsafe_b64encode(hashlib.sha1(f'{key}-{n}'.encode()).digest()).decode()[:11]
+
+class Dataset:
+    """Synthetic creators, each with an uploads playlist of `videos` videos (newest first)."""
+
+    def __init__(self, creators: int, videos: int):
+        self.creators = []
+        self.videos: dict[str, dict] = {}
+        self.segments: dict[str, list[dict]] = {}
+        for c in range(creators):
+            key = f'C{c:02d}'
+            creator = {
+                'key': key,
+                'handle': f'@bench{c}',
+                'channel_id': f'UCbench{c:017d}',
+                'uploads_id': f'UUbench{c:017d}',
+                'video_ids': []
+            }
+            self.creators.append(creator)
+            self.add_videos(creator, videos)
+
+    def add_videos(self, creator: dict, count: int):
+        start = len(creator['video_ids'])
+        new_ids = [video_id(creator['key'], n) for n in range(start, start + count)]
+        for n, yt_id in enumerate(new_ids, start):
+            self.videos[yt_id] = {
+                'snippet': {
+                    'title': f"{creator['key']} video {n}",
+                    'publishedAt': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(1500000000 + n * 86400)),
+                    'description': f'Synthetic video {n}\n' * 5,
+                    'tags': ['bench', creator['key']]
+                },
+                # Every clip is one second long, a few videos are premieres without a duration
+                'contentDetails': {'duration': 'P0D' if n % 500 == 499 else 'PT1S'},
+                'statistics': {'viewCount': str(n * 37), 'likeCount': str(n), 'commentCount': str(n // 10)}
+            }
+            # Roughly a third of the videos have segments, grouped by hash prefix like the real API
+            if hashlib.md5(yt_id.encode()).digest()[0] % 3 == 0:
+                prefix = hashlib.sha256(yt_id.encode()).hexdigest()[:4]
+                self.segments.setdefault(prefix, []).append({'videoID': yt_id, 'segments': [{'segment': [12.5, 75.0]}]})
+        creator['video_ids'][:0] = reversed(new_ids)
+
+    def creator_by(self, field: str, value: str) -> dict | None:
+        return next((creator for creator in self.creators if creator[field] == value), None)
+
+    def internal_ids(self, creator: dict) -> list[str]:
+        return [f"{creator['key']}_{n + 1:05d}" for n in range(len(creator['video_ids']))]
+
+class FakeApiServer:
+    """YouTube Data API and SponsorBlock endpoints on a local port, on their own event loop."""
+
+    def __init__(self, dataset: Dataset):
+        self.dataset = dataset
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='bench-api', daemon=True)
+        self.thread.start()
+        self.url = asyncio.run_coroutine_threadsafe(self.start(), self.loop).result()
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_get('/youtube/v3/channels', self.channels)
+        app.router.add_get('/youtube/v3/playlistItems', self.playlist_items)
+        app.router.add_get('/youtube/v3/videos', self.videos)
+        app.router.add_get('/sponsorblock/{prefix}', self.sponsorblock)
+        app.router.add_get('/vi/{video_id}/hqdefault.jpg', self.thumbnail)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        host, port = runner.addresses[0][:2]
+        return f'http://{host}:{port}'
+
+    async def channels(self, request: web.Request) -> web.Response:
+        count('youtube.channels')
+        if 'forHandle' in request.query:
+            creator = self.dataset.creator_by('handle', '@' + request.query['forHandle'])
+            return web.json_response({'items': [{'id': creator['channel_id']}] if creator else []})
+        creator = self.dataset.creator_by('channel_id', request.query['id'])
+        return web.json_response({'items': [{
+            'snippet': {'publishedAt': '2015-01-01T00:00:00Z', 'thumbnails': {'high': {'url': 'https://yt3.ggpht.com/icon'}}},
+            'brandingSettings': {'channel': {'title': creator['key'], 'description': 'Bench channel', 'country': 'US'}, 'image': {}},
+            'contentDetails': {'relatedPlaylists': {'uploads': creator['uploads_id']}}
+        }]})
+
+    async def playlist_items(self, request: web.Request) -> web.Response:
+        count('youtube.playlistItems')
+        creator = self.dataset.creator_by('uploads_id', request.query['playlistId'])
+        etag = f"\"{creator['uploads_id']}-{len(creator['video_ids'])}\""
+        if request.headers.get('If-None-Match') == etag:
+            return web.Response(status=304)
+        offset = int(request.query.get('pageToken', 0))
+        page_size = int(request.query.get('maxResults', 5))
+        page = creator['video_ids'][offset:offset + page_size]
+        body = {'etag': etag, 'items': [{'contentDetails': {'videoId': yt_id}} for yt_id in page]}
+        if offset + page_size < len(creator['video_ids']):
+            body['nextPageToken'] = str(offset + page_size)
+        return web.json_response(body)
+
+    async def videos(self, request: web.Request) -> web.Response:
+        count('youtube.videos')
+        parts = request.query['part'].split(',')
+        items = []
+        for yt_id in request.query['id'].split(','):
+            video = self.dataset.videos.get(yt_id)
+            if video:
+                item = {'id': yt_id, **{part: video[part] for part in parts}}
+                if 'snippet' in item:
+                    item['snippet'] = {**item['snippet'], 'thumbnails': {'high': {'url': f'{self.url}/vi/{yt_id}/hqdefault.jpg'}}}
+                items.append(item)
+        return web.json_response({'items': items})
+
+    async def sponsorblock(self, request: web.Request) -> web.Response:
+        count('sponsorblock.skipSegments')
+        matches = self.dataset.segments.get(request.match_info['prefix'])
+        if not matches:
+            return web.Response(status=404)
+        return web.json_response(matches)
+
+    async def thumbnail(self, request: web.Request) -> web.Response:
+        count('ytimg.thumbnail')
+        return web.Response(body=THUMBNAIL, content_type='image/jpeg')
+
+class FakeRequest:
+    def __init__(self, name: str, func):
+        self.name = name
+        self.func = func
+
+    def execute(self, num_retries: int = 0):
+        count(self.name)
+        return self.func()
+
+class FakeUpload:
+    """Resumable upload that reads the MediaFileUpload chunk by chunk like the real client."""
+
+    def __init__(self, drive: 'FakeDrive', body: dict, media_body):
+        self.drive = drive
+        self.body = body
+        self.media = media_body
+        self.resumable_progress = 0
+        self.md5 = hashlib.md5()
+        self.resumable_uri = f'fake://upload/{id(self)}'
+
+    def next_chunk(self, num_retries: int = 0):
+        count('drive.files.create.chunk')
+        total = self.media.size()
+        data = self.media.getbytes(self.resumable_progress, min(self.media.chunksize(), total - self.resumable_progress))
+        self.md5.update(data)
+        self.resumable_progress += len(data)
+        if self.resumable_progress < total:
+            return MediaUploadProgress(self.resumable_progress, total), None
+        file_id = self.drive.add_file(self.body['name'], self.media.mimetype(), self.body['parents'], self.md5.hexdigest(), total)
+        return None, {'id': file_id}
+
+    def execute(self, num_retries: int = 0):
+        response = None
+        while response is None:
+            _, response = self.next_chunk(num_retries)
+        return response
+
+class FakeDrive:
+    """Drive v3 files and changes resources, kept in memory."""
+
+    def __init__(self):
+        self.files_by_id: dict[str, dict] = {}
+        self.changes_log: list[str] = []
+        self.lock = threading.Lock()
+
+    def add_file(self, name: str, mimetype: str, parents: list[str], md5: str = '', size: int = 0) -> str:
+        with self.lock:
+            file_id = f'file{len(self.files_by_id):07d}'
+            self.files_by_id[file_id] = {'id': file_id, 'name': name, 'mimeType': mimetype, 'parents': parents, 'md5Checksum': md5, 'size': str(size)}
+            self.changes_log.append(file_id)
+        return file_id
+
+    def files(self):
+        return self
+
+    def changes(self):
+        return FakeDriveChanges(self)
+
+    def list(self, q: str, pageSize: int = 100, pageToken: str | None = None, **kwargs):
+        folder_id = re.match(r"'([^']+)' in parents", q).group(1)
+
+        def execute():
+            with self.lock:
+                files = [file for file in self.files_by_id.values() if folder_id in file['parents'] and not file.get('trashed')]
+            offset = int(pageToken or 0)
+            result = {'files': [dict(file) for file in files[offset:offset + pageSize]]}
+            if offset + pageSize < len(files):
+                result['nextPageToken'] = str(offset + pageSize)
+            return result
+        return FakeRequest('drive.files.list', execute)
+
+    def create(self, body: dict, media_body, **kwargs):
+        return FakeUpload(self, body, media_body)
+
+    def get(self, fileId: str, **kwargs):
+        return FakeRequest('drive.files.get', lambda: dict(self.files_by_id[fileId]))
+
+    def update(self, fileId: str, body: dict, **kwargs):
+        def execute():
+            with self.lock:
+                self.files_by_id[fileId].update(body)
+                self.changes_log.append(fileId)
+            return {'id': fileId}
+        return FakeRequest('drive.files.update', execute)
+
+class FakeDriveChanges:
+    def __init__(self, drive: FakeDrive):
+        self.drive = drive
+
+    def getStartPageToken(self, **kwargs):
+        return FakeRequest('drive.changes.getStartPageToken', lambda: {'startPageToken': str(len(self.drive.changes_log))})
+
+    def list(self, pageToken: str, pageSize: int = 1000, **kwargs):
+        def execute():
+            with self.drive.lock:
+                start = int(pageToken)
+                file_ids = self.drive.changes_log[start:start + pageSize]
+                changes = [{'fileId': file_id, 'removed': False, 'file': {'trashed': False, **self.drive.files_by_id[file_id]}} for file_id in file_ids]
+                if start + pageSize < len(self.drive.changes_log):
+                    return {'changes': changes, 'nextPageToken': str(start + pageSize)}
+                return {'changes': changes, 'newStartPageToken': str(len(self.drive.changes_log))}
+        return FakeRequest('drive.changes.list', execute)
+
+def cell(value) -> str:
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    return '' if value is None else str(value)
+
+class FakeWorksheet:
+    """Just enough of gspread.Worksheet for main.py, storing cells as the strings Sheets would."""
+
+    def __init__(self, title: str, rows: list[list]):
+        self.title = title
+        self.rows = [[cell(value) for value in row] for row in rows]
+        self.row_count = max(1000, len(rows))
+
+    def write(self, start_row: int, start_col: int, values: list[list]):
+        for r, row in enumerate(values, start_row):
+            while len(self.rows) <= r:
+                self.rows.append([])
+            target = self.rows[r]
+            target.extend([''] * (start_col + len(row) - len(target)))
+            target[start_col:start_col + len(row)] = [cell(value) for value in row]
+
+    def get_all_values(self) -> list[list[str]]:
+        count('sheets.get_all_values')
+        width = max((len(row) for row in self.rows), default=0)
+        return [row + [''] * (width - len(row)) for row in self.rows]
+
+    def get_all_records(self) -> list[dict]:
+        count('sheets.get_all_records')
+        if not self.rows:
+            return []
+        headers = self.rows[0]
+        return [dict(zip(headers, numericise_all(row + [''] * (len(headers) - len(row))))) for row in self.rows[1:]]
+
+    def batch_get(self, ranges: list[str]) -> list[list[list[str]]]:
+        count('sheets.batch_get')
+        value_ranges = []
+        for range_name in ranges:
+            grid = a1_range_to_grid_range(range_name)
+            values = []
+            for row in self.rows[grid.get('startRowIndex', 0):grid.get('endRowIndex', len(self.rows))]:
+                values.append(row[grid.get('startColumnIndex', 0):grid.get('endColumnIndex', len(row))])
+                # Like the API, trailing empty cells and rows are left out
+                while values[-1] and values[-1][-1] == '':
+                    values[-1].pop()
+            while values and not values[-1]:
+                values.pop()
+            value_ranges.append(values)
+        return value_ranges
+
+    def update(self, values: list[list], range_name: str = 'A1'):
+        count('sheets.update')
+        grid = a1_range_to_grid_range(range_name)
+        self.write(grid.get('startRowIndex', 0), grid.get('startColumnIndex', 0), values)
+
+    def batch_update(self, data: list[dict]):
+        count('sheets.batch_update')
+        for update in data:
+            grid = a1_range_to_grid_range(update['range'])
+            self.write(grid.get('startRowIndex', 0), grid.get('startColumnIndex', 0), update['values'])
+
+    def batch_clear(self, ranges: list[str]):
+        count('sheets.batch_clear')
+        for range_name in ranges:
+            grid = a1_range_to_grid_range(range_name)
+            for row in self.rows[grid.get('startRowIndex', 0):grid.get('endRowIndex', len(self.rows))]:
+                for col in range(grid.get('startColumnIndex', 0), min(grid.get('endColumnIndex', len(row)), len(row))):
+                    row[col] = ''
+        while self.rows and not any(self.rows[-1]):
+            self.rows.pop()
+
+    def clear(self):
+        count('sheets.clear')
+        self.rows = []
+
+    def insert_rows(self, values: list[list], row: int = 1):
+        count('sheets.insert_rows')
+        self.rows[row - 1:row - 1] = [[cell(value) for value in values_row] for values_row in values]
+        self.row_count += len(values)
+
+    def add_rows(self, rows: int):
+        count('sheets.add_rows')
+        self.row_count += rows
+
+class FakeSpreadsheet:
+    def __init__(self, worksheets: list[FakeWorksheet]):
+        self.by_title = {worksheet.title: worksheet for worksheet in worksheets}
+
+    def worksheet(self, title: str) -> FakeWorksheet:
+        count('sheets.worksheet')
+        if title not in self.by_title:
+            raise gspread.exceptions.WorksheetNotFound(title)
+        return self.by_title[title]
+
+    def worksheets(self) -> list[FakeWorksheet]:
+        count('sheets.worksheets')
+        return list(self.by_title.values())
+
+class FakeYoutubeDL:
+    """Stands in for yt_dlp.YoutubeDL, "downloading" the prepared clips in turn."""
+
+    def __init__(self, clips: list[str], direct: bool):
+        self.clips = clips
+        self.direct = direct
+        self.params = {'outtmpl': {'default': ''}}
+        self.downloads = 0
+
+    def download(self, urls: list[str]):
+        count('ytdlp.download')
+        output_path = self.params['outtmpl']['default']
+        if self.direct:
+            output_path = os.path.join('encoded', output_path)
+        shutil.copyfile(self.clips[self.downloads % len(self.clips)], output_path)
+        self.downloads += 1
+
+def make_clips(workdir: str, size_kb: int) -> tuple[list[str], bool]:
+    """Tiny test clips: one that needs a full encode and one that only needs a remux.
+
+    Falls back to random bytes (upload path only) when ffmpeg is not installed.
+    """
+    clips_dir = os.path.join(workdir, 'clips')
+    os.makedirs(clips_dir, exist_ok=True)
+    if not shutil.which('ffmpeg') or not shutil.which('ffprobe'):
+        path = os.path.join(clips_dir, 'random.mp4')
+        with open(path, 'wb') as f:
+            f.write(os.urandom(size_kb * 1024))
+        return [path], False
+    clips = []
+    for name, video_codec in (('encode.mp4', 'mpeg4'), ('remux.mp4', 'libx264')):
+        path = os.path.join(clips_dir, name)
+        subprocess.run([
+            'ffmpeg', '-y', '-v', 'error',
+            '-f', 'lavfi', '-i', 'testsrc=size=160x120:rate=15:duration=1',
+            '-f', 'lavfi', '-i', 'sine=frequency=440:duration=1',
+            '-c:v', video_codec, '-c:a', 'aac', '-shortest',
+            path
+        ], check=True)
+        clips.append(path)
+    return clips, True
+
+def measure(results: list[dict], stage: str, func):
+    before = Counter(calls)
+    tracemalloc.reset_peak()
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    delta = {name: value for name, value in (calls - before).items() if value}
+    results.append({'stage': stage, 'seconds': elapsed, 'peak_mb': peak / 1024 / 1024, 'calls': delta})
+    print(f'{stage}: {elapsed:.2f}s')
+
+def print_report(results: list[dict]):
+    upstreams = sorted({name.split('.')[0] for result in results for name in result['calls']})
+    header = f"{'stage':<34}{'wall s':>9}{'peak MB':>9}" + ''.join(f'{upstream:>15}' for upstream in upstreams)
+    print()
+    print(header)
+    print('-' * len(header))
+    for result in results:
+        per_upstream = Counter()
+        for name, value in result['calls'].items():
+            per_upstream[name.split('.')[0]] += value
+        print(f"{result['stage']:<34}{result['seconds']:>9.2f}{result['peak_mb']:>9.1f}" + ''.join(f'{per_upstream[upstream]:>15}' for upstream in upstreams))
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the archive pipeline against local fakes.')
+    parser.add_argument('--creators', type=int, default=3)
+    parser.add_argument('--videos', type=int, default=2000, help='videos per creator')
+    parser.add_argument('--new-videos', type=int, default=20, help='videos added per creator before the warm index run')
+    parser.add_argument('--clips', type=int, default=4, help='videos to download, encode and upload')
+    parser.add_argument('--clip-kb', type=int, default=256, help='size of the random clip when ffmpeg is missing')
+    parser.add_argument('--workdir', help='keep state and media here instead of a temporary directory')
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+    json_path = os.path.abspath(args.json) if args.json else None
+
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix='sauce-bench-'))
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    for directory in ('downloaded', 'encoded', 'thumbnails', 'credentials'):
+        os.makedirs(directory, exist_ok=True)
+    os.environ['YTAPI_KEY'] = 'bench'
+    os.environ['DISCORD_WEBHOOK_URL'] = ''
+    # Rate limits would only measure the governor, so lift them unless asked otherwise
+    os.environ.setdefault('YOUTUBE_UNITS_PER_SECOND', '1000000')
+    os.environ.setdefault('SHEETS_REQUESTS_PER_MINUTE', '1000000')
+    os.environ.setdefault('DRIVE_REQUESTS_PER_SECOND', '1000000')
+    os.environ.setdefault('STATE_DIR', os.path.join(workdir, 'state'))
+
+    dataset = Dataset(args.creators, args.videos)
+    server = FakeApiServer(dataset)
+    drive = FakeDrive()
+    index_rows = [INDEX_HEADERS]
+    worksheets = []
+    for creator in dataset.creators:
+        key = creator['key']
+        index_rows.append([key, creator['handle'], 'TRUE', f'videos-{key}', f'thumbnails-{key}'] + [''] * (len(INDEX_HEADERS) - 5))
+        worksheets.append(FakeWorksheet(key, []))
+        # The older half of every channel is already on Drive
+        for internal_id in dataset.internal_ids(creator)[:args.videos // 2]:
+            drive.add_file(f'{internal_id}.mp4', 'video/mp4', [f'videos-{key}'])
+    spreadsheet = FakeSpreadsheet([FakeWorksheet('Index', index_rows)] + worksheets)
+
+    clips, has_ffmpeg = make_clips(workdir, args.clip_kb)
+    if not has_ffmpeg:
+        print('ffmpeg not found, skipping the encode stage')
+
+    import youtube
+    youtube.API_URL = f'{server.url}/youtube/v3'
+    import main as pipeline
+    # Clients are created lazily, so swapping the factories keeps every call local
+    pipeline.get_drive_service = lambda: drive
+    pipeline.get_sheet = lambda: spreadsheet
+    pipeline.SPONSORBLOCK_API_URL = f'{server.url}/sponsorblock'
+    ydl = FakeYoutubeDL(clips, pipeline.config.DIRECT_DOWNLOAD)
+    pipeline.get_youtube_dl = lambda: ydl
+
+    tracemalloc.start()
+    results = []
+
+    def extract_index():
+        pipeline.index, pipeline.creator_keys = pipeline.extract_creator_index()
+    measure(results, 'extract_creator_index', extract_index)
+    keys = pipeline.creator_keys
+
+    def index_all():
+        for key in keys:
+            pipeline.index_videos(pipeline.index, key)
+    measure(results, 'index_videos (cold)', index_all)
+    for creator in dataset.creators:
+        dataset.add_videos(creator, args.new_videos)
+    measure(results, 'index_videos (warm)', index_all)
+
+    def check_uploaded(cold: bool):
+        if cold:
+            # Drop the changes token so the listing cache relists every folder
+            pipeline.get_state_store().delete('drive', 'changes_token')
+            pipeline.drive_listing.expire()
+        for key in keys:
+            video_ids = [record['YouTube ID'] for record in pipeline.get_creator_records(key)]
+            pipeline.check_uploaded_videos(pipeline.index, key, video_ids, {})
+    measure(results, 'check_uploaded_videos (cold)', lambda: check_uploaded(True))
+    measure(results, 'check_uploaded_videos (warm)', lambda: check_uploaded(False))
+
+    def download():
+        jobs = []
+        for key in keys:
+            jobs += pipeline.get_videos_to_download(key)
+        for yt_id, internal_id, _ in jobs[:args.clips]:
+            pipeline.download_video(yt_id, internal_id)
+    measure(results, 'download', download)
+
+    if has_ffmpeg:
+        measure(results, 'encode_videos', lambda: pipeline.encode_videos(pipeline.get_expected_durations(keys)))
+    else:
+        for path in os.listdir('downloaded'):
+            shutil.move(os.path.join('downloaded', path), os.path.join('encoded', path))
+
+    def upload():
+        for key in keys:
+            pipeline.upload_videos(key)
+    measure(results, 'upload_videos', upload)
+
+    def upload_thumbnails():
+        for key in keys:
+            pipeline.upload_thumbnails(pipeline.index, key)
+    measure(results, 'upload_thumbnails', upload_thumbnails)
+
+    def update_sheets():
+        for key in keys:
+            pipeline.update_sheet_info(key)
+        pipeline.flush_sheet_mirror()
+    measure(results, 'update_sheet_info', update_sheets)
+
+    def refresh_stats():
+        for key in keys:
+            pipeline.refresh_video_stats(key)
+        pipeline.flush_sheet_mirror()
+    measure(results, 'refresh_video_stats', refresh_stats)
+
+    tracemalloc.stop()
+    youtube_client = pipeline.get_youtube_client()
+    youtube_client.close()
+    print_report(results)
+    print(f'\nYouTube quota used: {youtube_client.quota_used} units')
+    if json_path:
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+    if not args.workdir:
+        os.chdir('/')
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -2,5 +2,6 @@ mkdir -p credentials
 mkdir -p downloaded
 mkdir -p encoded
 mkdir -p thumbnails
+mkdir -p state
 
 docker build -t youtube-mirror .
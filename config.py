@@ -4,4 +4,62 @@ from dotenv import load_dotenv
 load_dotenv()
 
 DISCORD_WEBHOOK_URL = os.getenv('DISCORD_WEBHOOK_URL')
+DISCORD_BATCH_SECONDS = float(os.getenv('DISCORD_BATCH_SECONDS', '2'))
+DISCORD_FLUSH_SECONDS = float(os.getenv('DISCORD_FLUSH_SECONDS', '30'))
 YTAPI_KEY = os.getenv('YTAPI_KEY')
+
+PIPELINE_MODE = os.getenv('PIPELINE_MODE', 'serial')
+DOWNLOAD_WORKERS = int(os.getenv('DOWNLOAD_WORKERS', '2'))
+ENCODE_WORKERS = int(os.getenv('ENCODE_WORKERS', '1'))
+UPLOAD_WORKERS = int(os.getenv('UPLOAD_WORKERS', '2'))
+MAX_PENDING_UPLOADS = int(os.getenv('MAX_PENDING_UPLOADS', '4'))
+if MAX_PENDING_UPLOADS < 1:
+    # Every pipelined download needs a slot, with none the pipeline would wait forever
+    raise ValueError(f'MAX_PENDING_UPLOADS must be at least 1, got {MAX_PENDING_UPLOADS}')
+
+STATE_DIR = os.getenv('STATE_DIR', 'state')
+INCREMENTAL_SYNC = os.getenv('INCREMENTAL_SYNC', 'false').upper() == 'TRUE'
+FULL_SYNC_INTERVAL_HOURS = float(os.getenv('FULL_SYNC_INTERVAL_HOURS', '168'))
+USE_STATE_DB = os.getenv('USE_STATE_DB', 'false').upper() == 'TRUE'
+
+CREATOR_WORKERS = int(os.getenv('CREATOR_WORKERS', '1'))
+YOUTUBE_UNITS_PER_SECOND = float(os.getenv('YOUTUBE_UNITS_PER_SECOND', '10'))
+SHEETS_REQUESTS_PER_MINUTE = float(os.getenv('SHEETS_REQUESTS_PER_MINUTE', '50'))
+DRIVE_REQUESTS_PER_SECOND = float(os.getenv('DRIVE_REQUESTS_PER_SECOND', '10'))
+UPLOAD_CHUNK_MB = int(os.getenv('UPLOAD_CHUNK_MB', '64'))
+
+REMUX_WORKERS = int(os.getenv('REMUX_WORKERS', '4'))
+ENCODE_THREADS_PER_JOB = int(os.getenv('ENCODE_THREADS_PER_JOB', '4'))
+DURATION_TOLERANCE_SECONDS = float(os.getenv('DURATION_TOLERANCE_SECONDS', '3'))
+SHORT_DOWNLOAD_ATTEMPTS = int(os.getenv('SHORT_DOWNLOAD_ATTEMPTS', '3'))
+ENCODE_PROFILE = os.getenv('ENCODE_PROFILE', 'default')
+ENCODE_PROFILES_FILE = os.getenv('ENCODE_PROFILES_FILE')
+
+FRAGMENT_WORKERS = int(os.getenv('FRAGMENT_WORKERS', '4'))
+DOWNLOAD_RATE_LIMIT_MBPS = float(os.getenv('DOWNLOAD_RATE_LIMIT_MBPS', '0'))
+DOWNLOAD_RETRY_BASE_HOURS = float(os.getenv('DOWNLOAD_RETRY_BASE_HOURS', '1'))
+DOWNLOAD_RETRY_MAX_HOURS = float(os.getenv('DOWNLOAD_RETRY_MAX_HOURS', '168'))
+DIRECT_DOWNLOAD = os.getenv('DIRECT_DOWNLOAD', 'false').upper() == 'TRUE'
+
+RELEASE_UPLOADED_FILES = os.getenv('RELEASE_UPLOADED_FILES', 'true').upper() == 'TRUE'
+DISK_HIGH_WATER_PERCENT = float(os.getenv('DISK_HIGH_WATER_PERCENT', '90'))
+DISK_WAIT_MINUTES = float(os.getenv('DISK_WAIT_MINUTES', '30'))
+
+SPONSORBLOCK_CONCURRENCY = int(os.getenv('SPONSORBLOCK_CONCURRENCY', '8'))
+SPONSORBLOCK_TTL_DAYS = float(os.getenv('SPONSORBLOCK_TTL_DAYS', '30'))
+SPONSORBLOCK_EMPTY_TTL_DAYS = float(os.getenv('SPONSORBLOCK_EMPTY_TTL_DAYS', '3'))
+SPONSORBLOCK_BACKFILL = os.getenv('SPONSORBLOCK_BACKFILL', 'true').upper() == 'TRUE'
+
+DAEMON_PORT = int(os.getenv('DAEMON_PORT', '5000'))
+INDEX_INTERVAL_MINUTES = float(os.getenv('INDEX_INTERVAL_MINUTES', '360'))
+DOWNLOAD_INTERVAL_MINUTES = float(os.getenv('DOWNLOAD_INTERVAL_MINUTES', '60'))
+ENCODE_INTERVAL_MINUTES = float(os.getenv('ENCODE_INTERVAL_MINUTES', '30'))
+UPLOAD_INTERVAL_MINUTES = float(os.getenv('UPLOAD_INTERVAL_MINUTES', '60'))
+STATS_INTERVAL_MINUTES = float(os.getenv('STATS_INTERVAL_MINUTES', '180'))
+
+METRICS_LOG = os.getenv('METRICS_LOG', os.path.join(STATE_DIR, 'metrics.jsonl'))
+METRICS_TEXTFILE = os.getenv('METRICS_TEXTFILE', os.path.join(STATE_DIR, 'metrics.prom'))
+
+THUMBNAIL_CONCURRENCY = int(os.getenv('THUMBNAIL_CONCURRENCY', '16'))
+THUMBNAIL_UPLOAD_WORKERS = int(os.getenv('THUMBNAIL_UPLOAD_WORKERS', '8'))
+THUMBNAILS_IN_MEMORY = os.getenv('THUMBNAILS_IN_MEMORY', 'false').upper() == 'TRUE'
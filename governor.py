@@ -0,0 +1,48 @@
+import threading
+import time
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1):
+        # The bucket never holds more than capacity, so a larger request could never be granted
+        tokens = min(tokens, self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.paused_until and self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = max(self.paused_until - now, (tokens - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+
+class RateGovernor:
+    """Shares one token bucket per upstream API between every worker thread.
+
+    `acquire` blocks until the upstream has budget for the call; `pause` is used
+    when an upstream answers 429 so that all threads back off together.
+    """
+
+    def __init__(self, limits: dict[str, tuple[float, float]]):
+        self.buckets = {name: TokenBucket(rate, capacity) for name, (rate, capacity) in limits.items()}
+
+    def acquire(self, upstream: str, tokens: float = 1):
+        self.buckets[upstream].acquire(tokens)
+
+    def pause(self, upstream: str, seconds: float):
+        self.buckets[upstream].pause(seconds)
@@ -1,42 +1,96 @@
 import os
+import argparse
+import json
+import hashlib
+import io
+import mmap
+import functools
+from operator import attrgetter
+import inspect
 from pathlib import Path
 import re
+import shutil
+import signal
 import subprocess
+import sys
 import dotenv
 import gspread
 import asyncio
 import aiohttp
+import queue
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from google.oauth2.service_account import Credentials
-from googleapiclient.http import MediaFileUpload
-from googleapiclient.discovery import build
+from gspread.utils import numericise_all, rowcol_to_a1
 import requests
-import yt_dlp
 import time
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 
 import config
+from governor import RateGovernor
+from metrics import Metrics
+from notifications import DiscordOutbox
+from profiles import ENCODE_PROFILES, EncodeProfile, load_encode_profiles
+from records import INDEX_HEADERS, VIDEO_FIELDS, VIDEO_HEADERS, CreatorRecord, VideoRecord
+from state import StateStore
+from youtube import STATS_FIELDS, YouTubeClient
 
-def create_session_with_retries():
-    session = requests.Session()
-    retry_strategy = Retry(
-        total=5,
-        backoff_factor=1,
-        status_forcelist=[429, 500, 502, 503, 504],
-        allowed_methods=["HEAD", "GET", "OPTIONS", "POST", "PUT"]
-    )
-    adapter = HTTPAdapter(max_retries=retry_strategy)
-    session.mount("http://", adapter)
-    session.mount("https://", adapter)
-    return session
+governor = RateGovernor({
+    'youtube': (config.YOUTUBE_UNITS_PER_SECOND, config.YOUTUBE_UNITS_PER_SECOND),
+    'sheets': (config.SHEETS_REQUESTS_PER_MINUTE / 60, 5),
+    'drive': (config.DRIVE_REQUESTS_PER_SECOND, config.DRIVE_REQUESTS_PER_SECOND),
+    # Bytes per second across every yt-dlp download in the process, charged from the progress hook
+    'download': (config.DOWNLOAD_RATE_LIMIT_MBPS * 1024 * 1024, config.DOWNLOAD_RATE_LIMIT_MBPS * 1024 * 1024),
+})
+metrics = Metrics(config.METRICS_LOG)
+
+def acquire_api(upstream: str, units: int = 1):
+    governor.acquire(upstream, units)
+    metrics.inc('api_requests_total', upstream=upstream)
 
-session = create_session_with_retries()
 dotenv.load_dotenv()
 api_key = config.YTAPI_KEY
 scopes = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
-creds = Credentials.from_service_account_file('credentials/sauce-plus-api.json', scopes=scopes)
-drive_service = build('drive', 'v3', credentials=creds)
+sheets_id = '1y1E7CT-1TxGXdGpLFfioYDcOknlyuDs22fOOKcZmXvo'
+
+# Clients are created on first use, so a stage only pays for the APIs it talks to.
+# The Google client libraries and yt-dlp are slow to import and are imported there too.
+youtube_client = None
+credentials = None
+spreadsheet = None
+discord_outbox = None
+clients_lock = threading.RLock()
+drive_local = threading.local()
+
+def get_youtube_client() -> YouTubeClient:
+    global youtube_client
+    with clients_lock:
+        if youtube_client is None:
+            youtube_client = YouTubeClient(api_key, governor, metrics)
+        return youtube_client
+
+def get_discord_outbox() -> DiscordOutbox:
+    global discord_outbox
+    with clients_lock:
+        if discord_outbox is None:
+            discord_outbox = DiscordOutbox(config.DISCORD_WEBHOOK_URL, get_state_store(), metrics, config.DISCORD_BATCH_SECONDS)
+        return discord_outbox
+
+def get_credentials():
+    global credentials
+    with clients_lock:
+        if credentials is None:
+            from google.oauth2.service_account import Credentials
+            credentials = Credentials.from_service_account_file('credentials/sauce-plus-api.json', scopes=scopes)
+        return credentials
+
+def get_drive_service():
+    # googleapiclient services are not thread-safe, so each worker thread gets its own
+    service = getattr(drive_local, 'service', None)
+    if service is None:
+        from googleapiclient.discovery import build
+        service = build('drive', 'v3', credentials=get_credentials(), cache_discovery=False)
+        drive_local.service = service
+    return service
 
 def authorize_gspread_with_retry(creds, max_retries=3):
     for attempt in range(max_retries):
@@ -51,40 +105,258 @@ def authorize_gspread_with_retry(creds, max_retries=3):
             else:
                 raise
 
-client = authorize_gspread_with_retry(creds)
-sheets_id = '1y1E7CT-1TxGXdGpLFfioYDcOknlyuDs22fOOKcZmXvo'
-sheet = client.open_by_key(sheets_id)
-
-def get_sheet_index(sheet: gspread.Spreadsheet):
-    index_sheet = sheet.worksheet('Index')
-    records = index_sheet.get_all_records()
-    index = {}
-    for record in records:
-        creator_info: dict = index.setdefault(record['Key'], {})
-        creator_info['handle'] = record['Handle'] or None
-        creator_info['video_drive_id'] = record['Video Drive ID'] or None
-        creator_info['archive_videos'] = record.get('Archive Videos', '').upper() == 'TRUE'
-        creator_info['thumbnail_drive_id'] = record['Thumbnail Drive ID'] or None
-        creator_info['channel_id'] = record['Channel ID'] or None
-        creator_info['title'] = record['Title'] or None
-        creator_info['created'] = record['Created'] or None
-        creator_info['description'] = record['Description'] or None
-        creator_info['country'] = record['Country'] or None
-        creator_info['keywords'] = record['Keywords'] or None
-        creator_info['icon'] = record['Icon'] or None
-        creator_info['banner'] = record['Banner'] or None
-        creator_info['uploads_id'] = record['Uploads ID'] or None
-    return index
-
-def get_channel_id(channel_handle: str, api_key: str) -> str:
-    handle = channel_handle.lstrip('@')
-    url = f'https://www.googleapis.com/youtube/v3/channels?part=id&forHandle={handle}&key={api_key}'
-    response = session.get(url)
-    response.raise_for_status()
-    data = response.json()
-    if not data.get('items'):
-        raise ValueError(f'Channel not found: {channel_handle}')
-    return data['items'][0]['id']
+def get_sheet() -> gspread.Spreadsheet:
+    global spreadsheet
+    with clients_lock:
+        if spreadsheet is None:
+            spreadsheet = authorize_gspread_with_retry(get_credentials()).open_by_key(sheets_id)
+        return spreadsheet
+
+def gspread_retry(func, max_retries=3, *args, **kwargs):
+    for attempt in range(max_retries):
+        acquire_api('sheets')
+        try:
+            return func(*args, **kwargs)
+        except (requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout,
+                gspread.exceptions.APIError) as e:
+            if attempt < max_retries - 1:
+                wait_time = 2 ** attempt
+                metrics.inc('retries_total', upstream='sheets')
+                if getattr(e, 'code', None) == 429:
+                    # Quota is shared by every thread, so make all of them wait
+                    governor.pause('sheets', wait_time * 10)
+                print(f"gspread call failed, retrying in {wait_time}s... ({e})")
+                time.sleep(wait_time)
+            else:
+                print(f"gspread call failed after {max_retries} attempts")
+                raise
+
+state_store = None
+state_store_lock = threading.Lock()
+
+def get_state_store() -> StateStore:
+    global state_store
+    with state_store_lock:
+        if state_store is None:
+            state_store = StateStore(os.path.join(config.STATE_DIR, 'state.db'))
+        return state_store
+
+def sheet_cell(value) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    return str(value)
+
+def changed_span(old_row: list[str], new_row: list) -> tuple[int, int] | None:
+    new_cells = [sheet_cell(value) for value in new_row]
+    old_cells = old_row[:len(new_cells)] + [''] * (len(new_cells) - len(old_row))
+    changed = [i for i, (old, new) in enumerate(zip(old_cells, new_cells)) if old != new]
+    if not changed:
+        return None
+    return changed[0], changed[-1]
+
+def write_sheet_diff(worksheet: gspread.Worksheet, old_rows: list[list], new_rows: list[list]):
+    """Write only the cells of new_rows that differ from old_rows, in one batch_update and without clearing the sheet."""
+    old_rows = [[sheet_cell(value) for value in row] for row in old_rows]
+    width = len(new_rows[0])
+    if len(new_rows) > worksheet.row_count:
+        gspread_retry(worksheet.add_rows, 3, len(new_rows) - worksheet.row_count)
+    # New videos are added at the top, so shift the existing rows down instead of rewriting them all
+    added = len(new_rows) - len(old_rows)
+    if added > 0 and len(old_rows) > 1 and sheet_cell(new_rows[1 + added][0]) == old_rows[1][0]:
+        gspread_retry(worksheet.insert_rows, 3, new_rows[1:1 + added], 2)
+        old_rows = old_rows[:1] + [[sheet_cell(value) for value in row] for row in new_rows[1:1 + added]] + old_rows[1:]
+    # Consecutive rows that changed in the same columns (e.g. just Status) share one range
+    updates = []
+    block_start, block_span = None, None
+    for i in range(len(new_rows) + 1):
+        span = None
+        if i < len(new_rows):
+            span = changed_span(old_rows[i] if i < len(old_rows) else [], new_rows[i])
+        if span == block_span:
+            continue
+        if block_span is not None:
+            first_col, last_col = block_span
+            updates.append({
+                'range': f'{rowcol_to_a1(block_start + 1, first_col + 1)}:{rowcol_to_a1(i, last_col + 1)}',
+                'values': [row[first_col:last_col + 1] for row in new_rows[block_start:i]]
+            })
+        block_start, block_span = i, span
+    metrics.annotate(ranges_written=len(updates))
+    if updates:
+        gspread_retry(worksheet.batch_update, 3, updates)
+    if len(old_rows) > len(new_rows):
+        gspread_retry(worksheet.batch_clear, 3, [f'{rowcol_to_a1(len(new_rows) + 1, 1)}:{rowcol_to_a1(len(old_rows), max(width, len(old_rows[0])))}'])
+
+def mark_sheet_dirty(name: str):
+    get_state_store().set('dirty_sheets', name, True)
+
+@metrics.timed('sheet_write')
+def flush_sheet_mirror():
+    """Push the rows that changed in the state database to the Google Sheet."""
+    if not config.USE_STATE_DB:
+        return
+    store = get_state_store()
+    for name in store.items('dirty_sheets'):
+        try:
+            worksheet = gspread_retry(get_sheet().worksheet, 3, name)
+            if name == 'Index':
+                rows = [INDEX_HEADERS] + [[record.get(h, '') for h in INDEX_HEADERS] for record in store.get_creators().values()]
+                # The Index sheet is edited by hand, so diff against what is really there
+                old_rows = None
+            else:
+                rows = [VIDEO_HEADERS] + [[record.get(h, '') for h in VIDEO_HEADERS] for record in store.get_videos(name)]
+                old_rows = store.get_mirror(name)
+            if old_rows is None:
+                old_rows = gspread_retry(worksheet.get_all_values, 3)
+            write_sheet_diff(worksheet, old_rows, rows)
+            store.set_mirror(name, [[sheet_cell(value) for value in row] for row in rows])
+            store.delete('dirty_sheets', name)
+        except Exception as e:
+            # The sheet may be half written, re-read it on the next flush
+            store.set_mirror(name, [])
+            print(f'Error mirroring {name} to sheet: {e}')
+
+def get_creator_records(key: str) -> list[dict]:
+    if not config.USE_STATE_DB:
+        return gspread_retry(gspread_retry(get_sheet().worksheet, 3, key).get_all_records, 3)
+    store = get_state_store()
+    if not store.has_videos(key):
+        # Seed the database from the worksheet the first time a creator is seen
+        store.set_videos(key, gspread_retry(gspread_retry(get_sheet().worksheet, 3, key).get_all_records, 3))
+    return store.get_videos(key)
+
+@metrics.timed('sheet_write')
+def set_creator_rows(key: str, rows: list[list], old_records: list[dict] | None = None):
+    """Store a creator's video rows. Passing the records they were built from lets the sheet be diffed instead of rewritten."""
+    metrics.annotate(creator=key, rows=len(rows))
+    if not config.USE_STATE_DB:
+        creator_sheet = gspread_retry(get_sheet().worksheet, 3, key)
+        if old_records is not None:
+            old_rows = [VIDEO_HEADERS] + [[record.get(h, '') for h in VIDEO_HEADERS] for record in old_records]
+            write_sheet_diff(creator_sheet, old_rows, [VIDEO_HEADERS] + rows)
+        else:
+            gspread_retry(creator_sheet.clear, 3)
+            gspread_retry(creator_sheet.update, 3, [VIDEO_HEADERS] + rows, 'A1')
+        cache_creator_rows(key, rows)
+        return
+    cache_creator_rows(key, rows)
+    get_state_store().set_videos(key, [dict(zip(VIDEO_HEADERS, row)) for row in rows])
+    mark_sheet_dirty(key)
+
+creator_columns: dict[str, dict[str, list]] = {}
+creator_columns_lock = threading.Lock()
+
+def cache_creator_rows(key: str, rows: list[list]):
+    # The rows are the whole worksheet, so later stages can read any column from them instead of the sheet
+    with creator_columns_lock:
+        creator_columns[key] = {column: [row[position] for row in rows] for position, column in enumerate(VIDEO_HEADERS)}
+
+def clear_creator_columns():
+    with creator_columns_lock:
+        creator_columns.clear()
+
+def read_creator_columns(key: str, columns: list[str]) -> dict[str, list]:
+    if config.USE_STATE_DB:
+        records = get_creator_records(key)
+        return {column: [record.get(column, '') for record in records] for column in columns}
+    # Adjacent columns are fetched as one range, e.g. Internal ID and Status as C2:D
+    positions = sorted(VIDEO_HEADERS.index(column) for column in columns)
+    spans = []
+    for position in positions:
+        if spans and spans[-1][1] == position - 1:
+            spans[-1][1] = position
+        else:
+            spans.append([position, position])
+    ranges = [f"{rowcol_to_a1(2, first + 1)}:{rowcol_to_a1(1, last + 1).rstrip('0123456789')}" for first, last in spans]
+    worksheet = gspread_retry(get_sheet().worksheet, 3, key)
+    value_ranges = gspread_retry(worksheet.batch_get, 3, ranges)
+    length = max((len(value_range) for value_range in value_ranges), default=0)
+    values = {}
+    for (first, last), value_range in zip(spans, value_ranges):
+        rows = list(value_range) + [[]] * (length - len(value_range))
+        for offset in range(last - first + 1):
+            # Same number parsing as get_all_records, so both kinds of record compare equal
+            values[VIDEO_HEADERS[first + offset]] = numericise_all([row[offset] if offset < len(row) else '' for row in rows])
+    return values
+
+def get_creator_columns(key: str, columns: list[str]) -> list[VideoRecord]:
+    """Only the named columns of a creator's videos, read once per run and shared between stages."""
+    # Works from a copy, since the daemon may clear the cache while the sheet is being read;
+    # writers replace column lists rather than editing them, so the copy stays consistent
+    with creator_columns_lock:
+        cached = dict(creator_columns.get(key, {}))
+    missing = [column for column in columns if column not in cached]
+    if missing:
+        values = read_creator_columns(key, missing)
+        with creator_columns_lock:
+            creator_columns.setdefault(key, {}).update(values)
+        cached.update(values)
+    length = max(len(cached[column]) for column in columns)
+    return [
+        VideoRecord.from_sheet({column: cached[column][i] if i < len(cached[column]) else '' for column in columns})
+        for i in range(length)
+    ]
+
+@metrics.timed('sheet_write')
+def set_creator_columns(key: str, videos: list[VideoRecord], columns: list[str]):
+    """Write back `columns` of videos returned by get_creator_columns, leaving every other column untouched."""
+    metrics.annotate(creator=key, rows=len(videos))
+    if config.USE_STATE_DB:
+        store = get_state_store()
+        stored = store.get_videos(key)
+        for stored_record, video in zip(stored, videos):
+            stored_record.update({column: getattr(video, VIDEO_FIELDS[column]) for column in columns})
+        store.set_videos(key, stored)
+        mark_sheet_dirty(key)
+    else:
+        # Columns outside the projection are blank on both sides, so the diff never touches them
+        def project(video: VideoRecord) -> list:
+            return [value if header in columns else '' for header, value in zip(VIDEO_HEADERS, video.to_row())]
+        old_rows = [VIDEO_HEADERS] + [project(video) for video in get_creator_columns(key, columns)]
+        new_rows = [VIDEO_HEADERS] + [project(video) for video in videos]
+        write_sheet_diff(gspread_retry(get_sheet().worksheet, 3, key), old_rows, new_rows)
+    with creator_columns_lock:
+        cached = creator_columns.setdefault(key, {})
+        for column in columns:
+            cached[column] = [getattr(video, VIDEO_FIELDS[column]) for video in videos]
+
+creator_locks: dict[str, threading.RLock] = {}
+creator_locks_guard = threading.Lock()
+
+def creator_locked(func):
+    # Serialises read-modify-write cycles on one creator's records when stages overlap
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        key = inspect.signature(func).bind(*args, **kwargs).arguments['key']
+        with creator_locks_guard:
+            lock = creator_locks.setdefault(key, threading.RLock())
+        with lock:
+            return func(*args, **kwargs)
+    return wrapper
+
+# Creator index of the current run, replaced by the CLI once the Index sheet is read
+index: dict[str, CreatorRecord] = {}
+
+def replace_index(new_index: dict[str, CreatorRecord]):
+    # Rebound rather than edited in place, so stages still running never see a half filled index
+    global index
+    index = new_index
+
+def get_sheet_index():
+    index_sheet = gspread_retry(get_sheet().worksheet, 3, 'Index')
+    records = gspread_retry(index_sheet.get_all_records, 3)
+    if config.USE_STATE_DB:
+        # Hand-entered cells win, everything looked up on earlier runs comes from the database
+        stored = get_state_store().get_creators()
+        records = [{**record, **stored.get(record['Key'], {}), **{k: v for k, v in record.items() if v != ''}} for record in records]
+    return {record['Key']: CreatorRecord.from_sheet(record) for record in records}
+
+def get_channel_id(channel_handle: str) -> str:
+    youtube = get_youtube_client()
+    return youtube.run(youtube.get_channel_id(channel_handle))
 
 def get_channel_branding(data, channel_id):
     icon_url = None
@@ -106,68 +378,66 @@ def get_channel_branding(data, channel_id):
         'banner_url': f"{banner_url}=w2560-fcrop64=1,00000000ffffffff-k-c0xffffffff-no-nd-rj"
     }
 
-def update_creator_index(key: str, index: dict):
-    if index[key]['channel_id'] != None:
+def update_creator_index(key: str, index: dict[str, CreatorRecord]):
+    creator = index[key]
+    if creator.channel_id != None:
         return
-    channel_id = get_channel_id(index[key]['handle'], api_key)
-    index[key]['channel_id'] = channel_id
-    url = f'https://www.googleapis.com/youtube/v3/channels?part=snippet,brandingSettings,contentDetails&id={channel_id}&key={api_key}'
-    response = session.get(url)
-    response.raise_for_status()
-    data = response.json()['items'][0]
-    index[key]['title'] = data['brandingSettings']['channel']['title']
-    index[key]['created'] = data['snippet']['publishedAt']
+    channel_id = get_channel_id(creator.handle)
+    creator.channel_id = channel_id
+    youtube = get_youtube_client()
+    data = youtube.run(youtube.get_channel(channel_id))
+    creator.title = data['brandingSettings']['channel']['title']
+    creator.created = data['snippet']['publishedAt']
     if 'description' in data['brandingSettings']['channel']:
-        index[key]['description'] = data['brandingSettings']['channel']['description']
+        creator.description = data['brandingSettings']['channel']['description']
     if 'keywords' in data['brandingSettings']['channel']:
-        index[key]['keywords'] = data['brandingSettings']['channel']['keywords']
+        creator.keywords = data['brandingSettings']['channel']['keywords']
     if 'country' in data['brandingSettings']['channel']:
-        index[key]['country'] = data['brandingSettings']['channel']['country']
+        creator.country = data['brandingSettings']['channel']['country']
     branding = get_channel_branding(data, channel_id)
-    index[key]['icon'] = branding['icon_url']
-    index[key]['banner'] = branding['banner_url']
-    index[key]['uploads_id'] = data['contentDetails']['relatedPlaylists']['uploads']
-
-def set_sheet_index(sheet: gspread.Spreadsheet, index: dict[str, dict]):
-    index_sheet = sheet.worksheet('Index')
-    headers = ['Key', 'Handle', 'Archive Videos', 'Video Drive ID', 'Thumbnail Drive ID', 'Channel ID', 'Title', 'Created', 'Description', 'Country', 'Keywords', 'Icon', 'Banner', 'Uploads ID']
-    rows = [headers]
-    for key, creator_info in index.items():
-        row = [
-            key,
-            creator_info.get('handle', ''),
-            creator_info.get('archive_videos', True),
-            creator_info.get('video_drive_id', ''),
-            creator_info.get('thumbnail_drive_id', ''),
-            creator_info.get('channel_id', ''),
-            creator_info.get('title', ''),
-            creator_info.get('created', ''),
-            creator_info.get('description', ''),
-            creator_info.get('country', ''),
-            creator_info.get('keywords', ''),
-            creator_info.get('icon', ''),
-            creator_info.get('banner', ''),
-            creator_info.get('uploads_id', '')
-        ]
-        rows.append(row)
-    index_sheet.clear()
-    index_sheet.update(rows, 'A1')
+    creator.icon = branding['icon_url']
+    creator.banner = branding['banner_url']
+    creator.uploads_id = data['contentDetails']['relatedPlaylists']['uploads']
 
-def get_video_ids(uploads_playlist_id, api_key):
-    video_ids = []
-    next_page_token = None
-    while True:
-        url = f'https://www.googleapis.com/youtube/v3/playlistItems?part=contentDetails&maxResults=50&playlistId={uploads_playlist_id}&key={api_key}'
-        if next_page_token:
-            url += f'&pageToken={next_page_token}'
-        response = session.get(url)
-        response.raise_for_status()
-        data = response.json()
-        video_ids += [item['contentDetails']['videoId'] for item in data['items']]
-        next_page_token = data.get('nextPageToken')
-        if not next_page_token:
-            break
-    return video_ids
+@metrics.timed('sheet_write')
+def set_sheet_index(index: dict[str, CreatorRecord]):
+    rows = [INDEX_HEADERS] + [creator.to_row() for creator in index.values()]
+    if config.USE_STATE_DB:
+        get_state_store().set_creators([dict(zip(INDEX_HEADERS, row)) for row in rows[1:]])
+        mark_sheet_dirty('Index')
+        return
+    index_sheet = gspread_retry(get_sheet().worksheet, 3, 'Index')
+    gspread_retry(index_sheet.clear, 3)
+    gspread_retry(index_sheet.update, 3, rows, 'A1')
+
+def load_state(name: str) -> dict:
+    return get_state_store().get('state', name, {})
+
+def save_state(name: str, data: dict):
+    get_state_store().set('state', name, data)
+
+def get_playlist_sync(uploads_playlist_id: str) -> dict | None:
+    playlist_state = load_state('playlists').get(uploads_playlist_id)
+    if not playlist_state:
+        return None
+    if time.time() - playlist_state['full_sync_at'] > config.FULL_SYNC_INTERVAL_HOURS * 3600:
+        return None
+    return playlist_state
+
+def save_playlist_sync(uploads_playlist_id: str, etag: str | None, last_seen_id: str | None, full_sync: bool):
+    sync_state = load_state('playlists')
+    playlist_state = sync_state.setdefault(uploads_playlist_id, {'full_sync_at': 0})
+    if etag:
+        playlist_state['etag'] = etag
+    if last_seen_id:
+        playlist_state['last_seen_id'] = last_seen_id
+    if full_sync:
+        playlist_state['full_sync_at'] = time.time()
+    save_state('playlists', sync_state)
+
+def get_video_ids(uploads_playlist_id: str, stop_ids: set[str] | None = None, etag: str | None = None) -> tuple[list[str] | None, str | None]:
+    youtube = get_youtube_client()
+    return youtube.run(youtube.get_video_ids(uploads_playlist_id, stop_ids, etag))
 
 def format_seconds(seconds):
     total_seconds = round(seconds)
@@ -175,41 +445,57 @@ def format_seconds(seconds):
     minutes, seconds = divmod(remainder, 60)
     return f"{hours}:{minutes:02}:{seconds:02}"
 
-async def get_sponsorblock_data_async(session_async: aiohttp.ClientSession, video_id) -> list[str]:
-    url = 'https://sponsor.ajay.app/api/skipSegments'
-    params = {'videoID': video_id}
-    try:
-        async with session_async.get(url, params=params, timeout=aiohttp.ClientTimeout(total=10)) as response:
-            if response.status == 200:
+def is_sponsorblock_due(video_id: str) -> bool:
+    cached = get_state_store().get('sponsorblock', video_id)
+    if not cached:
+        return True
+    # Videos without segments yet are rechecked sooner, they often get submissions after release
+    ttl_days = config.SPONSORBLOCK_TTL_DAYS if cached['segments'] else config.SPONSORBLOCK_EMPTY_TTL_DAYS
+    return time.time() - cached['fetched'] > ttl_days * 86400
+
+SPONSORBLOCK_API_URL = 'https://sponsor.ajay.app/api/skipSegments'
+
+async def get_sponsorblock_prefix_async(session_async: aiohttp.ClientSession, semaphore: asyncio.Semaphore, prefix: str, video_ids: set[str]) -> dict[str, list[str]]:
+    # The hash-prefix endpoint returns every video sharing the first 4 hex chars of sha256(videoID)
+    url = f'{SPONSORBLOCK_API_URL}/{prefix}'
+    async with semaphore:
+        try:
+            async with session_async.get(url, timeout=aiohttp.ClientTimeout(total=30)) as response:
+                if response.status == 404:
+                    return {video_id: [] for video_id in video_ids}
+                response.raise_for_status()
                 json_data = await response.json()
-                output = []
-                for item in json_data:
-                    output.append(f'{format_seconds(item["segment"][0])} - {format_seconds(item["segment"][1])}')
-                return output
-            else:
-                return []
-    except Exception:
-        return []
+        except Exception as e:
+            print(f'SponsorBlock lookup failed for prefix {prefix}: {e}')
+            return {}
+    output = {video_id: [] for video_id in video_ids}
+    for item in json_data:
+        if item['videoID'] in output:
+            output[item['videoID']] = [f'{format_seconds(segment["segment"][0])} - {format_seconds(segment["segment"][1])}' for segment in item['segments']]
+    return output
 
 async def fetch_all_sponsorblock_data(video_ids: list[str]) -> dict[str, list[str]]:
+    store = get_state_store()
+    results = {}
+    prefixes: dict[str, set[str]] = {}
+    for video_id in video_ids:
+        if is_sponsorblock_due(video_id):
+            prefixes.setdefault(hashlib.sha256(video_id.encode()).hexdigest()[:4], set()).add(video_id)
+        else:
+            results[video_id] = store.get('sponsorblock', video_id)['segments']
+    semaphore = asyncio.Semaphore(config.SPONSORBLOCK_CONCURRENCY)
     async with aiohttp.ClientSession() as session_async:
-        tasks = [get_sponsorblock_data_async(session_async, vid_id) for vid_id in video_ids]
-        results = await asyncio.gather(*tasks)
-        return dict(zip(video_ids, results))
-
-def get_video_metadata(video_ids, api_key):
-    video_details: list[dict] = []
-    for i in range(0, len(video_ids), 50):
-        ids = ','.join(video_ids[i:i+50])
-        url = f'https://www.googleapis.com/youtube/v3/videos?part=snippet,contentDetails,statistics&id={ids}&key={api_key}'
-        response = session.get(url)
-        response.raise_for_status()
-        video_details += response.json()['items']
-    output = {}
-    for item in video_details:
-        item_id = item.pop('id')
-        output[item_id] = item
-    return output
+        tasks = [get_sponsorblock_prefix_async(session_async, semaphore, prefix, ids) for prefix, ids in prefixes.items()]
+        for fetched in await asyncio.gather(*tasks):
+            # Failed lookups are left out so they are retried on the next run
+            for video_id, segments in fetched.items():
+                store.set('sponsorblock', video_id, {'segments': segments, 'fetched': time.time()})
+                results[video_id] = segments
+    return results
+
+def get_video_metadata(video_ids: list[str]) -> dict[str, dict]:
+    youtube = get_youtube_client()
+    return youtube.run(youtube.get_videos(video_ids))
 
 def duration_to_seconds(duration_str):
     if duration_str == 'P0D':
@@ -235,7 +521,8 @@ def get_files_in_folder(folder_id: str) -> list[dict]:
     files = []
     page_token = None
     while True:
-        results = drive_service.files().list(
+        acquire_api('drive')
+        results = get_drive_service().files().list(
             q=f"'{folder_id}' in parents and trashed=false",
             pageSize=100,
             fields="nextPageToken, files(id, name, mimeType, createdTime, modifiedTime, size, webViewLink)",
@@ -249,393 +536,1304 @@ def get_files_in_folder(folder_id: str) -> list[dict]:
             break
     return files
 
-def get_list_of_mp4_files(folder_id: str) -> list[str]:
-    files = get_files_in_folder(folder_id)
-    return [str(file['name']).removesuffix('.mp4') for file in files if file['mimeType'] == 'video/mp4']
+class DriveListingCache:
+    """Names of the files in each Drive folder, listed once and then kept current.
+
+    Folder contents are saved in the state store together with a Drive changes
+    page token, so later runs replay the changes since then instead of relisting.
+    """
+
+    def __init__(self):
+        self.folders: dict[str, dict[str, list[str]]] = {}
+        self.lock = threading.Lock()
+        self.refreshed = False
+
+    def refresh(self):
+        store = get_state_store()
+        token = store.get('drive', 'changes_token')
+        if token:
+            try:
+                self.folders = store.items('drive_folders')
+                token = self.apply_changes(token)
+            except Exception as e:
+                print(f'Drive changes replay failed, relisting folders: {e}')
+                token = None
+        if not token:
+            # Take the token before listing so nothing that happens during the listing is missed
+            self.folders = {}
+            for folder_id in store.items('drive_folders'):
+                store.delete('drive_folders', folder_id)
+            acquire_api('drive')
+            token = get_drive_service().changes().getStartPageToken(supportsAllDrives=True).execute()['startPageToken']
+        store.set('drive', 'changes_token', token)
+        self.refreshed = True
+
+    def apply_changes(self, token: str) -> str:
+        changed_folders = set()
+        while True:
+            acquire_api('drive')
+            results = get_drive_service().changes().list(
+                pageToken=token,
+                pageSize=1000,
+                fields='nextPageToken, newStartPageToken, changes(fileId, removed, file(name, mimeType, parents, trashed))',
+                supportsAllDrives=True,
+                includeItemsFromAllDrives=True
+            ).execute()
+            for change in results.get('changes', []):
+                file = change.get('file') or {}
+                parents = [] if change.get('removed') or file.get('trashed') else file.get('parents', [])
+                for folder_id, files in self.folders.items():
+                    if folder_id in parents:
+                        files[change['fileId']] = [file['name'], file['mimeType']]
+                        changed_folders.add(folder_id)
+                    elif files.pop(change['fileId'], None):
+                        changed_folders.add(folder_id)
+            if 'newStartPageToken' in results:
+                break
+            token = results['nextPageToken']
+        store = get_state_store()
+        for folder_id in changed_folders:
+            store.set('drive_folders', folder_id, self.folders[folder_id])
+        return results['newStartPageToken']
+
+    def expire(self):
+        # The next lookup replays the Drive changes made since the last refresh
+        with self.lock:
+            self.refreshed = False
+
+    def names(self, folder_id: str, mimetype: str) -> set[str]:
+        with self.lock:
+            if not self.refreshed:
+                self.refresh()
+            if folder_id not in self.folders:
+                files = get_files_in_folder(folder_id)
+                self.folders[folder_id] = {file['id']: [file['name'], file['mimeType']] for file in files}
+                get_state_store().set('drive_folders', folder_id, self.folders[folder_id])
+            return {name for name, file_mimetype in self.folders[folder_id].values() if file_mimetype == mimetype}
+
+    def add(self, folder_id: str, file_id: str, name: str, mimetype: str):
+        with self.lock:
+            if folder_id in self.folders:
+                self.folders[folder_id][file_id] = [name, mimetype]
+                get_state_store().set('drive_folders', folder_id, self.folders[folder_id])
+
+    def remove(self, folder_id: str, file_id: str):
+        with self.lock:
+            if self.folders.get(folder_id, {}).pop(file_id, None):
+                get_state_store().set('drive_folders', folder_id, self.folders[folder_id])
+
+drive_listing = DriveListingCache()
+
+def get_list_of_mp4_files(folder_id: str) -> set[str]:
+    return {name.removesuffix('.mp4') for name in drive_listing.names(folder_id, 'video/mp4')}
+
+def get_creator_keys(index: dict) -> list[str]:
+    worksheets = gspread_retry(get_sheet().worksheets, 3)
+    return [ws.title for ws in worksheets if ws.title != 'Index' and ws.title in index.keys()]
 
 def extract_creator_index() -> tuple[dict, list[str]]:
-    index = get_sheet_index(sheet)
-    worksheets = sheet.worksheets()
-    creator_keys = [ws.title for ws in worksheets if ws.title != 'Index' and ws.title in index.keys()]
-    for key in creator_keys:
-        update_creator_index(key, index)
-    set_sheet_index(sheet, index)
+    index = get_sheet_index()
+    creator_keys = get_creator_keys(index)
+    with ThreadPoolExecutor(max_workers=max(1, config.CREATOR_WORKERS)) as executor:
+        list(executor.map(lambda key: update_creator_index(key, index), creator_keys))
+    set_sheet_index(index)
     return index, creator_keys
 
-def check_uploaded_videos(index: dict, key: str, video_ids: list[str], video_index: dict):
-    mp4_files = get_list_of_mp4_files(index[key]['video_drive_id'])
+def check_uploaded_videos(index: dict[str, CreatorRecord], key: str, video_ids: list[str], video_index: dict[str, VideoRecord]):
+    mp4_files = get_list_of_mp4_files(index[key].video_drive_id)
     for idx, yt_id in enumerate(reversed(video_ids)):
-        internal_id = f'{key}_{str(idx+1).zfill(5)}'
-        video_data: dict = video_index.setdefault(yt_id, {})
+        video = video_index.get(yt_id)
+        if video is None:
+            video = video_index[yt_id] = VideoRecord(yt_id)
         # Only assign Internal ID if the video doesn't already have one
-        if not video_data.get('internal_id'):
-            video_data['internal_id'] = internal_id
-        # Use the actual internal_id (existing or new) to check upload status
-        actual_internal_id = video_data['internal_id']
-        if actual_internal_id in mp4_files:
-            video_data['status'] = 'uploaded'
-
-def index_videos(index: dict, key: str):
-    creator_sheet = sheet.worksheet(key)
-    headers = ['YouTube ID', 'YouTube Link', 'Internal ID', 'Status', 'Title', 'Publish Date', 'Duration', 'Description', 'Ad Timestamps', 'Thumbnail', 'Tags', 'Views', 'Likes', 'Comments']
-    creator_sheet.update([headers], 'A1')
-    video_ids = get_video_ids(index[key]['uploads_id'], api_key)
-    records = creator_sheet.get_all_records()
-    video_index = {}
-
-    # Load existing video data from sheet
-    for record in records:
-        video_data: dict = video_index.setdefault(record['YouTube ID'], {})
-        video_data['youtube_link'] = record['YouTube Link'] or None
-        video_data['internal_id'] = record['Internal ID'] or None
-        video_data['status'] = record['Status'] or None
-        video_data['title'] = record['Title'] or None
-        video_data['publish_date'] = record['Publish Date'] or None
-        video_data['duration'] = record['Duration'] or None
-        video_data['description'] = record['Description'] or None
-        video_data['ad_timestamps'] = record['Ad Timestamps'] or None
-        video_data['thumbnail'] = record['Thumbnail'] or None
-        video_data['tags'] = record['Tags'] or None
-        video_data['views'] = record['Views'] or None
-        video_data['likes'] = record['Likes'] or None
-        video_data['comments'] = record['Comments'] or None
-
-    # Identify unlisted videos (in sheet but not in current video_ids)
-    unlisted_ids = [yt_id for yt_id in video_index.keys() if yt_id not in video_ids]
+        if not video.internal_id:
+            video.internal_id = f'{key}_{str(idx+1).zfill(5)}'
+        if video.internal_id in mp4_files:
+            video.status = 'uploaded'
+
+@metrics.timed('index')
+@creator_locked
+def index_videos(index: dict[str, CreatorRecord], key: str):
+    metrics.annotate(creator=key)
+    if not config.USE_STATE_DB:
+        gspread_retry(gspread_retry(get_sheet().worksheet, 3, key).update, 3, [VIDEO_HEADERS], 'A1')
+    uploads_id = index[key].uploads_id
+    records = get_creator_records(key)
+    video_index = {video.yt_id: video for video in map(VideoRecord.from_sheet, records)}
+
+    playlist_sync = get_playlist_sync(uploads_id) if config.INCREMENTAL_SYNC and video_index else None
+    if playlist_sync:
+        # Only page until the first already indexed video; removals are picked up by the next full sync
+        stop_ids = set(video_index)
+        stop_ids.add(playlist_sync.get('last_seen_id'))
+        new_ids, etag = get_video_ids(uploads_id, stop_ids, playlist_sync.get('etag'))
+        known = sorted(video_index.values(), key=lambda video: video.internal_id or '', reverse=True)
+        video_ids = (new_ids or []) + [video.yt_id for video in known if video.status != 'unlisted']
+        unlisted_ids = [video.yt_id for video in known if video.status == 'unlisted']
+    else:
+        video_ids, etag = get_video_ids(uploads_id)
+
+        # Identify unlisted videos (in sheet but not in current video_ids)
+        listed_ids = set(video_ids)
+        unlisted_ids = [yt_id for yt_id in video_index if yt_id not in listed_ids]
 
     # Mark unlisted videos with updated status (but keep "uploaded" status if already uploaded)
     for yt_id in unlisted_ids:
-        current_status = video_index[yt_id]['status']
-        if current_status not in ['uploaded', 'unlisted', 'invalid']:
-            video_index[yt_id]['status'] = 'unlisted'
+        if video_index[yt_id].status not in ('uploaded', 'unlisted', 'invalid'):
+            video_index[yt_id].status = 'unlisted'
 
-    missing_ids = [id for id in video_ids if id not in video_index.keys()]
-    video_metadata = get_video_metadata(video_ids, api_key)
+    missing_ids = [yt_id for yt_id in video_ids if yt_id not in video_index]
+    metrics.annotate(videos=len(video_ids), new_videos=len(missing_ids))
+    video_metadata = get_video_metadata(missing_ids)
 
     # Combine video_ids with unlisted_ids for Internal ID assignment
     all_video_ids = video_ids + unlisted_ids
     check_uploaded_videos(index, key, all_video_ids, video_index)
 
-    sponsorblock_results = asyncio.run(fetch_all_sponsorblock_data(missing_ids))
+    recheck_ids = []
+    if config.SPONSORBLOCK_BACKFILL:
+        recheck_ids = [
+            video.yt_id for video in video_index.values()
+            if not video.ad_timestamps and video.status != 'invalid' and is_sponsorblock_due(video.yt_id)
+        ]
+    sponsorblock_results = asyncio.run(fetch_all_sponsorblock_data(missing_ids + recheck_ids))
+    for yt_id in recheck_ids:
+        if sponsorblock_results.get(yt_id):
+            video_index[yt_id].ad_timestamps = ', '.join(sponsorblock_results[yt_id])
     for yt_id in missing_ids:
-        video_data: dict = video_index.setdefault(yt_id, {})
+        video = video_index[yt_id]
         metadata = video_metadata[yt_id]
-        sponsorblock_data = sponsorblock_results.get(yt_id, [])
-        video_data['status'] = 'indexed'
-        video_data['title'] = metadata['snippet']['title']
-        video_data['publish_date'] = metadata['snippet']['publishedAt']
         duration = duration_to_seconds(metadata['contentDetails']['duration'])
-        video_data['duration'] = duration
-        if duration == 'N/A':
-            video_data['status'] = 'invalid'
-        video_data['description'] = metadata['snippet']['description']
-        video_data['ad_timestamps'] = ', '.join(sponsorblock_data)
-        video_data['thumbnail'] = get_video_thumbnail_url(metadata)
-        video_data['tags'] = str(metadata['snippet'].get('tags', []))
-        video_data['views'] = metadata['statistics'].get('viewCount', '0')
-        video_data['likes'] = metadata['statistics'].get('likeCount', '0')
-        video_data['comments'] = metadata['statistics'].get('commentCount', '0')
-
-    rows = [headers]
+        video.status = 'invalid' if duration == 'N/A' else 'indexed'
+        video.title = metadata['snippet']['title']
+        video.publish_date = metadata['snippet']['publishedAt']
+        video.duration = duration
+        video.description = metadata['snippet']['description']
+        video.ad_timestamps = ', '.join(sponsorblock_results.get(yt_id, []))
+        video.thumbnail = get_video_thumbnail_url(metadata)
+        video.tags = str(metadata['snippet'].get('tags', []))
+        video.views = metadata['statistics'].get('viewCount', '0')
+        video.likes = metadata['statistics'].get('likeCount', '0')
+        video.comments = metadata['statistics'].get('commentCount', '0')
+
     # Sort all videos by Internal ID in descending order (newest first)
-    sorted_video_ids = sorted(all_video_ids,
-                              key=lambda yt_id: video_index.get(yt_id, {}).get('internal_id', ''),
-                              reverse=True)
-
-    for yt_id in sorted_video_ids:
-        video_data = video_index.get(yt_id, {})
-        row = [
-            yt_id,
-            f"https://www.youtube.com/watch?v={yt_id}",
-            video_data.get('internal_id', ''),
-            video_data.get('status', ''),
-            video_data.get('title', ''),
-            video_data.get('publish_date', ''),
-            video_data.get('duration', ''),
-            video_data.get('description', ''),
-            video_data.get('ad_timestamps', ''),
-            video_data.get('thumbnail', ''),
-            video_data.get('tags', ''),
-            video_data.get('views', ''),
-            video_data.get('likes', ''),
-            video_data.get('comments', '')
-        ]
-        rows.append(row)
-    creator_sheet.clear()
-    creator_sheet.update(rows, 'A1')
+    videos = sorted((video_index[yt_id] for yt_id in all_video_ids), key=attrgetter('internal_id'), reverse=True)
+    set_creator_rows(key, [video.to_row() for video in videos], records)
+    save_playlist_sync(uploads_id, etag, video_ids[0] if video_ids else None, not playlist_sync)
+
+UPLOADED_STAGES = ('uploaded', 'released')
+
+def get_artifact(internal_id: str) -> dict:
+    return get_state_store().get('artifacts', internal_id, {})
+
+def set_artifact_stage(internal_id: str, stage: str, **fields):
+    # Manifest of where each video's local copy is, so skips don't depend on files staying on disk
+    store = get_state_store()
+    artifact = store.get('artifacts', internal_id, {})
+    artifact.update(fields, stage=stage, updated=time.time())
+    store.set('artifacts', internal_id, artifact)
+
+MEDIA_DIRS = ('downloaded', 'encoded')
+
+def is_artifact_due(artifact: dict) -> bool:
+    # Uploaded videos are done, and short downloads wait out their backoff before being fetched again
+    return artifact.get('stage') not in UPLOADED_STAGES and time.time() >= artifact.get('retry_at', 0)
+
+def has_disk_space(paths: tuple[str, ...] = MEDIA_DIRS) -> bool:
+    # The media folders are usually their own volumes, so each one is checked rather than the working directory
+    for path in paths:
+        os.makedirs(path, exist_ok=True)
+        usage = shutil.disk_usage(path)
+        if usage.used / usage.total * 100 >= config.DISK_HIGH_WATER_PERCENT:
+            return False
+    return True
+
+def wait_for_disk_space(timeout: float, paths: tuple[str, ...] = MEDIA_DIRS) -> bool:
+    deadline = time.monotonic() + timeout
+    while not has_disk_space(paths):
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(10)
+    return True
+
+ydl_local = threading.local()
+download_progress: dict[str, int] = {}
+download_progress_lock = threading.Lock()
 
-def download_video(video_id: str, internal_id: str) -> bool:
+def throttle_download(progress: dict):
+    # yt-dlp reports a running total per file, so charge the shared bucket with what arrived since the last report
+    file_name = progress.get('tmpfilename') or progress.get('filename')
+    downloaded = progress.get('downloaded_bytes') or 0
+    with download_progress_lock:
+        received = downloaded - download_progress.get(file_name, 0)
+        if progress['status'] == 'downloading':
+            download_progress[file_name] = downloaded
+        else:
+            download_progress.pop(file_name, None)
+    if received > 0:
+        governor.acquire('download', received)
+
+def get_youtube_dl() -> 'yt_dlp.YoutubeDL':
+    # One YoutubeDL per worker thread, reused for every video that thread downloads
+    ydl = getattr(ydl_local, 'ydl', None)
+    if ydl is None:
+        import yt_dlp
+        ydl_opts = {
+            'cookiefile': 'credentials/youtube_cookies.txt',
+            'quiet': True,
+            'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
+            'merge_output_format': 'mp4',
+            'concurrent_fragment_downloads': config.FRAGMENT_WORKERS,
+        }
+        if config.DIRECT_DOWNLOAD:
+            # Prefer streams that only need a remux, and let the merger write straight into encoded/
+            ydl_opts['format'] = 'bestvideo[vcodec^=avc1]+bestaudio[acodec^=mp4a]/best[vcodec^=avc1][acodec^=mp4a]/' + ydl_opts['format']
+            ydl_opts['paths'] = {'home': 'encoded', 'temp': 'downloaded'}
+        if config.DOWNLOAD_RATE_LIMIT_MBPS > 0:
+            # The cap is for all downloads together, however many creators and daemon syncs are running
+            ydl_opts['progress_hooks'] = [throttle_download]
+        ydl = yt_dlp.YoutubeDL(ydl_opts)
+        ydl_local.ydl = ydl
+    return ydl
+
+def is_download_due(video_id: str) -> bool:
+    outcome = get_state_store().get('downloads', video_id)
+    return not outcome or time.time() >= outcome.get('next_attempt', 0)
+
+def backfill_artifact(internal_id: str):
+    """Manifest entry for a file left by an earlier version, or by a crash before download_video recorded it."""
+    final_path = f'encoded/{internal_id}.mp4'
+    if not os.path.exists(final_path):
+        # yt-dlp only renames a download to its final name once it is merged
+        set_artifact_stage(internal_id, 'downloaded', size=os.path.getsize(f'downloaded/{internal_id}.mp4'))
+        return
+    # There's no telling whether an old encode finished, so it has to probe cleanly before it is uploaded
+    try:
+        probe_media(final_path)
+    except Exception as e:
+        set_artifact_stage(internal_id, 'unverified', probe_error=str(e))
+        return
+    md5, size = file_digest(final_path)
+    set_artifact_stage(internal_id, 'encoded', size=size, md5=md5)
+
+downloads_in_flight: set[str] = set()
+downloads_in_flight_lock = threading.Lock()
+
+@metrics.timed('download')
+def download_video(video_id: str, internal_id: str, duration: int | str = '') -> bool:
+    metrics.annotate(video=internal_id)
+    # The daemon's /sync and its scheduled download stage can reach the same video at once
+    with downloads_in_flight_lock:
+        if video_id in downloads_in_flight:
+            metrics.annotate(skipped=True, reason='already downloading')
+            return False
+        downloads_in_flight.add(video_id)
+    try:
+        return fetch_video(video_id, internal_id, duration)
+    finally:
+        with downloads_in_flight_lock:
+            downloads_in_flight.discard(video_id)
+
+def fetch_video(video_id: str, internal_id: str, duration: int | str) -> bool:
     os.makedirs('downloaded', exist_ok=True)
     output_path = f"downloaded/{internal_id}.mp4"
-    if os.path.exists(output_path):
+    final_path = f"encoded/{internal_id}.mp4"
+    if os.path.exists(output_path) or os.path.exists(final_path):
+        metrics.annotate(skipped=True)
+        if not get_artifact(internal_id).get('stage'):
+            backfill_artifact(internal_id)
         return True
-    ydl_opts = {
-        'cookiefile': 'credentials/youtube_cookies.txt',
-        'quiet': True,
-        'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
-        'outtmpl': output_path,
-        'merge_output_format': 'mp4',
-    }
+    # Direct downloads are merged into encoded/, the rest are encoded there later
+    if not has_disk_space(MEDIA_DIRS):
+        print(f'Skipped download of {internal_id}: disk usage above {config.DISK_HIGH_WATER_PERCENT:g}%')
+        metrics.annotate(reason='disk usage above high water mark')
+        return False
+    store = get_state_store()
+    attempts = store.get('downloads', video_id, {}).get('attempts', 0) + 1
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([f'https://www.youtube.com/watch?v={video_id}'])
+        ydl = get_youtube_dl()
+        if config.DIRECT_DOWNLOAD:
+            os.makedirs('encoded', exist_ok=True)
+            ydl.params['outtmpl']['default'] = f'{internal_id}.mp4'
+        else:
+            ydl.params['outtmpl']['default'] = output_path
+        ydl.download([f'https://www.youtube.com/watch?v={video_id}'])
+        probe_error = None
+        if config.DIRECT_DOWNLOAD:
+            try:
+                if not get_encode_profile(internal_id).can_copy(probe_media(final_path)):
+                    # Nothing the creator's profile can keep as is was available, hand the file to the encode pass
+                    shutil.move(final_path, output_path)
+            except Exception as e:
+                # The download itself worked, keep it and probe again before it is uploaded
+                probe_error = str(e)
+                print(f'Could not probe {final_path}, holding it back from upload: {e}')
+        store.set('downloads', video_id, {'status': 'downloaded', 'attempts': attempts, 'updated': time.time()})
+        downloaded_path = final_path if os.path.exists(final_path) else output_path
+        metrics.annotate(bytes=os.path.getsize(downloaded_path), attempts=attempts)
+        if probe_error:
+            set_artifact_stage(internal_id, 'unverified', size=os.path.getsize(downloaded_path), probe_error=probe_error, duration=duration)
+        elif downloaded_path == final_path:
+            md5, size = file_digest(final_path)
+            set_artifact_stage(internal_id, 'encoded', size=size, md5=md5, duration=duration)
+        else:
+            # The expected duration is kept so the encode command can check downloads without Sheets
+            set_artifact_stage(internal_id, 'downloaded', size=os.path.getsize(downloaded_path), duration=duration)
         return True
     except Exception as e:
+        retry_hours = min(config.DOWNLOAD_RETRY_BASE_HOURS * 2 ** (attempts - 1), config.DOWNLOAD_RETRY_MAX_HOURS)
+        store.set('downloads', video_id, {
+            'status': 'failed',
+            'attempts': attempts,
+            'error': str(e),
+            'next_attempt': time.time() + retry_hours * 3600,
+            'updated': time.time()
+        })
+        print(f'Download failed for {internal_id} (attempt {attempts}, retrying in {retry_hours:g}h): {e}')
+        metrics.annotate(reason=str(e), attempts=attempts)
+        if attempts > 1:
+            metrics.inc('retries_total', upstream='yt-dlp')
         return False
 
-def download_videos(key: str):
-    creator_sheet = sheet.worksheet(key)
-    records = creator_sheet.get_all_records()
-    video_ids = [r['YouTube ID'] for r in records]
-    video_index = {}
-    for record in records:
-        video_data = video_index.setdefault(record['YouTube ID'], {})
-        video_data['internal_id'] = record['Internal ID']
-        video_data['status'] = record['Status']
-    check_uploaded_videos(index, key, video_ids, video_index)
-    headers = ['YouTube ID', 'YouTube Link', 'Internal ID', 'Status', 'Title', 'Publish Date', 'Duration', 'Description', 'Ad Timestamps', 'Thumbnail', 'Tags', 'Views', 'Likes', 'Comments']
-    rows = [headers]
-    for record in records:
-        yt_id = record['YouTube ID']
-        row = [
-            yt_id,
-            f"https://www.youtube.com/watch?v={yt_id}",
-            record['Internal ID'],
-            video_index.get(yt_id, {}).get('status', record['Status']),
-            record['Title'],
-            record['Publish Date'],
-            record['Duration'],
-            record['Description'],
-            record['Ad Timestamps'],
-            record['Thumbnail'],
-            record['Tags'],
-            record['Views'],
-            record['Likes'],
-            record['Comments']
-        ]
-        rows.append(row)
-    creator_sheet.clear()
-    creator_sheet.update(rows, 'A1')
-    videos_to_download = [
-        (record['YouTube ID'], record['Internal ID'])
-        for record in records
-        if video_index.get(record['YouTube ID'], {}).get('status') == 'indexed'
-        and record['YouTube ID'] and record['Internal ID']
+@creator_locked
+def get_videos_to_download(key: str) -> list[tuple[str, str, int | str]]:
+    videos = get_creator_columns(key, ['YouTube ID', 'Internal ID', 'Status', 'Duration'])
+    # Internal IDs are only assigned by index_videos, so check a copy and write back just the statuses
+    video_index = {video.yt_id: VideoRecord(video.yt_id, internal_id=video.internal_id, status=video.status) for video in videos}
+    check_uploaded_videos(index, key, list(video_index), video_index)
+    for video in videos:
+        video.status = video_index[video.yt_id].status
+    set_creator_columns(key, videos, ['Status'])
+    return [
+        (video.yt_id, video.internal_id, video.duration)
+        for video in videos
+        if video.status == 'indexed'
+        and video.yt_id and video.internal_id
+        and is_download_due(video.yt_id)
+        and is_artifact_due(get_artifact(video.internal_id))
     ]
-    for yt_id, internal_id in videos_to_download:
-        download_video(yt_id, internal_id)
-
-def get_codecs(input_path: str) -> tuple[str, str]:
-    def probe(stream_type: str) -> str:
-        result = subprocess.run(
-            ['ffprobe', '-v', 'error',
-             '-select_streams', f'{stream_type}:0',
-             '-show_entries', 'stream=codec_name',
-             '-of', 'default=nw=1:nk=1',
-             input_path],
-            capture_output=True, text=True
-        )
-        return result.stdout.strip()
-    video_codec = probe('v')
-    audio_codec = probe('a')
-    return video_codec, audio_codec
-
-def reencode_video(input_path: str, output_path: str) -> bool:
+
+download_pool = None
+
+def get_download_pool() -> ThreadPoolExecutor:
+    # One pool for the whole process: its threads, and so their YoutubeDL instances,
+    # are reused by every creator and daemon cycle instead of piling up per call
+    global download_pool
+    with clients_lock:
+        if download_pool is None:
+            download_pool = ThreadPoolExecutor(max_workers=max(1, config.DOWNLOAD_WORKERS), thread_name_prefix='download')
+        return download_pool
+
+def download_videos(key: str):
+    executor = get_download_pool()
+    futures = [executor.submit(download_video, yt_id, internal_id, duration) for yt_id, internal_id, duration in get_videos_to_download(key)]
+    for future in as_completed(futures):
+        future.result()
+
+def get_stored_durations(creator_keys: list[str]) -> dict[str, int]:
+    """Expected durations kept in the state database, for the encode command, which never signs in to Sheets."""
+    store = get_state_store()
+    durations = {
+        internal_id: artifact['duration'] for internal_id, artifact in store.items('artifacts').items()
+        if isinstance(artifact.get('duration'), int) and creator_key(internal_id) in creator_keys
+    }
+    if config.USE_STATE_DB:
+        for key in creator_keys:
+            for record in store.get_videos(key):
+                if record.get('Internal ID') and isinstance(record.get('Duration'), int):
+                    durations.setdefault(record['Internal ID'], record['Duration'])
+    return durations
+
+def get_expected_durations(creator_keys: list[str]) -> dict[str, int]:
+    durations = {}
+    for key in creator_keys:
+        for video in get_creator_columns(key, ['Internal ID', 'Duration']):
+            if video.internal_id and isinstance(video.duration, int):
+                durations[video.internal_id] = video.duration
+    return durations
+
+def probe_media(input_path: str) -> dict:
+    """Codec, resolution, duration, bitrate and stream layout from one ffprobe call, cached by path + size + mtime."""
+    stat = os.stat(input_path)
+    store = get_state_store()
+    cached = store.get('probes', input_path)
+    if cached and cached['size'] == stat.st_size and cached['mtime'] == stat.st_mtime:
+        return cached
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error',
+         '-print_format', 'json',
+         '-show_format', '-show_streams',
+         input_path],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        # Not cached, so the next call probes again
+        stderr = result.stderr.strip().splitlines()
+        raise RuntimeError(f"ffprobe failed for {input_path}: {stderr[-1] if stderr else f'exit code {result.returncode}'}")
+    data = json.loads(result.stdout or '{}')
+    streams = data.get('streams', [])
+    video = next((stream for stream in streams if stream.get('codec_type') == 'video'), {})
+    audio = next((stream for stream in streams if stream.get('codec_type') == 'audio'), {})
+    media_format = data.get('format', {})
+    probe = {
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'video_codec': video.get('codec_name', ''),
+        'audio_codec': audio.get('codec_name', ''),
+        'width': video.get('width', 0),
+        'height': video.get('height', 0),
+        'duration': float(media_format.get('duration') or 0),
+        'bit_rate': int(media_format.get('bit_rate') or 0),
+        'streams': [f"{stream.get('codec_type')}:{stream.get('codec_name')}" for stream in streams]
+    }
+    store.set('probes', input_path, probe)
+    return probe
+
+# The built-in profiles until the CLI loads ENCODE_PROFILES_FILE, so importing main never reads or exits
+encode_profiles: dict[str, EncodeProfile] = dict(ENCODE_PROFILES)
+
+def load_cli_encode_profiles():
+    global encode_profiles
+    encode_profiles = load_encode_profiles(config.ENCODE_PROFILES_FILE)
+    if config.ENCODE_PROFILE not in encode_profiles:
+        # Every creator without a valid profile of their own falls back to this one
+        sys.exit(f"Unknown ENCODE_PROFILE {config.ENCODE_PROFILE}, expected one of: {', '.join(encode_profiles)}")
+
+def creator_key(internal_id: str) -> str:
+    # Internal IDs are <key>_<number>
+    return internal_id.rsplit('_', 1)[0]
+
+def get_encode_profile(internal_id: str) -> EncodeProfile:
+    # Creators without an Encode Profile cell get ENCODE_PROFILE
+    key = creator_key(internal_id)
+    name = getattr(index.get(key), 'encode_profile', None) or config.ENCODE_PROFILE
+    if name not in encode_profiles:
+        print(f'Unknown encode profile {name} for {key}, using {config.ENCODE_PROFILE}')
+        name = config.ENCODE_PROFILE
+    return encode_profiles[name]
+
+def is_complete_download(input_path: str, expected_duration) -> bool:
+    """Whether a download can be encoded. Files that can't be probed are kept but marked unverified."""
+    try:
+        actual_duration = probe_media(input_path)['duration']
+    except Exception as e:
+        print(f'Could not probe {input_path}, keeping it for the next pass: {e}')
+        set_artifact_stage(Path(input_path).stem, 'unverified', probe_error=str(e))
+        return False
+    if not isinstance(expected_duration, int) or actual_duration >= expected_duration - config.DURATION_TOLERANCE_SECONDS:
+        return True
+    internal_id = Path(input_path).stem
+    short_downloads = get_artifact(internal_id).get('short_downloads', 0) + 1
+    if short_downloads >= config.SHORT_DOWNLOAD_ATTEMPTS:
+        # The sheet's duration is probably wrong; keep the file for a person to check instead of fetching it forever
+        print(f'{input_path} is still {actual_duration:.0f}s of {expected_duration}s after {short_downloads} downloads, holding it as unverified')
+        set_artifact_stage(internal_id, 'unverified', short_downloads=short_downloads)
+        return False
+    retry_hours = min(config.DOWNLOAD_RETRY_BASE_HOURS * 2 ** (short_downloads - 1), config.DOWNLOAD_RETRY_MAX_HOURS)
+    print(f'Incomplete download {input_path}: {actual_duration:.0f}s of {expected_duration}s, removing it and retrying in {retry_hours:g}h')
+    os.remove(input_path)
+    set_artifact_stage(internal_id, 'incomplete', short_downloads=short_downloads, retry_at=time.time() + retry_hours * 3600)
+    return False
+
+@metrics.timed('encode')
+def reencode_video(input_path: str, output_path: str, threads: int = 0) -> bool:
+    internal_id = Path(output_path).stem
+    profile = get_encode_profile(internal_id)
+    metrics.annotate(video=internal_id, profile=profile.name)
+    # ffmpeg writes under a temporary name, so encoded/ only ever holds finished encodes
+    partial_path = f'{output_path}.part'
     try:
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        video_codec, audio_codec = get_codecs(input_path)
-        if video_codec == 'h264' and (audio_codec == 'aac' or audio_codec == ''):
-            subprocess.run([
-                'ffmpeg', '-y',
-                '-i', input_path,
-                '-c', 'copy',
-                output_path
-            ], check=True, capture_output=True)
-        else:
-            subprocess.run([
-                'ffmpeg', '-y',
-                '-i', input_path,
-                '-c:v', 'libx264',
-                '-preset', 'fast',
-                '-crf', '23',
-                '-c:a', 'aac',
-                '-b:a', '128k',
-                output_path
-            ], check=True, capture_output=True)
+        probe = probe_media(input_path)
+        copy = profile.can_copy(probe)
+        subprocess.run([
+            'ffmpeg', '-y',
+            '-i', input_path,
+            *(['-c', 'copy'] if copy else profile.ffmpeg_args(probe, threads)),
+            '-f', 'mp4', partial_path
+        ], check=True, capture_output=True)
+        # Hashed while ffmpeg's output is still in the page cache; uploads verify against this
+        md5, size = file_digest(partial_path)
+        os.replace(partial_path, output_path)
+        set_artifact_stage(internal_id, 'encoded', size=size, md5=md5)
+        if config.DIRECT_DOWNLOAD:
+            # The encoded copy is the only one uploads need
+            os.remove(input_path)
+        metrics.annotate(bytes=size, input_bytes=probe['size'], copied=copy)
+        metrics.inc('encode_input_bytes_total', probe['size'], profile=profile.name)
+        metrics.inc('encode_output_bytes_total', size, profile=profile.name)
         return True
-    except:
+    except subprocess.CalledProcessError as e:
+        stderr = e.stderr.decode(errors='replace').strip().splitlines() if e.stderr else []
+        metrics.annotate(reason=stderr[-1] if stderr else str(e))
+        return False
+    except Exception as e:
+        metrics.annotate(reason=str(e))
         return False
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+
+def run_encode_job(input_file: Path, output_file: Path, probe: dict, threads: int) -> bool:
+    profile = get_encode_profile(input_file.stem)
+    started = time.monotonic()
+    success = reencode_video(str(input_file), str(output_file), threads)
+    elapsed = time.monotonic() - started
+    action = 'Remuxed' if profile.can_copy(probe) else 'Encoded'
+    if success:
+        output_mb = os.path.getsize(output_file) / 1024 / 1024
+        print(f"{action} {input_file.name} ({profile.name}): {elapsed:.1f}s, {probe['duration'] / max(elapsed, 0.001):.1f}x realtime, "
+              f"{probe['size'] / 1024 / 1024:.1f} MB -> {output_mb:.1f} MB")
+    else:
+        print(f'Failed to encode {input_file.name} after {elapsed:.1f}s')
+    return success
 
-def encode_videos():
+DOWNLOADED_FILE = re.compile(r'.+_\d+\.mp4')
+
+def get_downloaded_files() -> list[Path]:
+    """Finished downloads waiting for the encode pass.
+
+    yt-dlp writes its .fNNN.mp4 and .temp.mp4 parts next to them, and a file only
+    gets its manifest entry once the download is done, so anything else is skipped.
+    """
+    files = []
+    for path in Path('downloaded').glob('**/*.mp4'):
+        if not DOWNLOADED_FILE.fullmatch(path.name):
+            continue
+        artifact = get_artifact(path.stem)
+        # Files that kept coming out short are held back until someone looks at them
+        if artifact.get('stage') in ('downloaded', 'unverified') and artifact.get('short_downloads', 0) < config.SHORT_DOWNLOAD_ATTEMPTS:
+            files.append(path)
+    return files
+
+def get_downloaded_creator_keys() -> list[str]:
+    # The files on disk are named after Internal IDs, so they say which creators they belong to
+    return sorted({creator_key(path.stem) for path in get_downloaded_files()})
+
+def encode_videos(expected_durations: dict[str, int] | None = None, creator_keys: list[str] | None = None):
     downloaded_path = Path('downloaded')
     encoded_path = Path('encoded')
     if not downloaded_path.exists():
         return
-    video_files = list(downloaded_path.glob('**/*.mp4'))
+    video_files = get_downloaded_files()
+    if creator_keys is not None:
+        video_files = [path for path in video_files if creator_key(path.stem) in creator_keys]
     if not video_files:
         return
+    expected_durations = expected_durations or {}
+    copy_jobs = []
+    cpu_jobs = []
     for input_file in video_files:
         relative_path = input_file.relative_to(downloaded_path)
         output_file = encoded_path / relative_path
         if output_file.exists():
             continue
-        reencode_video(str(input_file), str(output_file))
+        if not is_complete_download(str(input_file), expected_durations.get(input_file.stem)):
+            continue
+        probe = probe_media(str(input_file))
+        if get_encode_profile(input_file.stem).can_copy(probe):
+            copy_jobs.append((input_file, output_file, probe))
+        else:
+            cpu_jobs.append((input_file, output_file, probe))
 
-def upload_file(folder_id: str, file_name: str, folder: str, mimetype: str) -> str:
-    file_path = f"{folder}/{file_name}"
-    if not os.path.exists(file_path):
-        return 'N/A'
+    # Longest jobs first so a big encode doesn't start last and hold up the whole pass
+    copy_jobs.sort(key=lambda job: job[2]['duration'], reverse=True)
+    cpu_jobs.sort(key=lambda job: job[2]['duration'], reverse=True)
+    threads = max(1, min(config.ENCODE_THREADS_PER_JOB, os.cpu_count() or 1))
+    encode_workers = max(1, (os.cpu_count() or 1) // threads)
+    # Remuxes are I/O bound and run alongside the CPU encodes in their own pool
+    with ThreadPoolExecutor(max_workers=max(1, config.REMUX_WORKERS)) as remux_pool, \
+         ThreadPoolExecutor(max_workers=encode_workers) as encode_pool:
+        futures = [encode_pool.submit(run_encode_job, *job, threads) for job in cpu_jobs]
+        futures += [remux_pool.submit(run_encode_job, *job, 0) for job in copy_jobs]
+        for future in as_completed(futures):
+            future.result()
+
+def create_upload_request(folder_id: str, file_name: str, file_path: str, mimetype: str):
+    from googleapiclient.http import MediaFileUpload
     file_metadata = {
         'name': file_name,
         'parents': [folder_id]
     }
-    media = MediaFileUpload(file_path, mimetype=mimetype, resumable=True)
-    file = drive_service.files().create(
+    media = MediaFileUpload(file_path, mimetype=mimetype, chunksize=config.UPLOAD_CHUNK_MB * 1024 * 1024, resumable=True)
+    return get_drive_service().files().create(
         body=file_metadata,
         media_body=media,
         fields='id',
         supportsAllDrives=True
-    ).execute()
-    return file.get('id')
+    )
+
+def query_upload_offset(upload_uri: str, size: int) -> tuple[int, dict | None]:
+    """Ask Drive how much of a resumable upload it has, returning (offset, response once complete)."""
+    from google.auth.transport.requests import AuthorizedSession
+    acquire_api('drive')
+    # An empty PUT with Content-Range bytes */<size> is the documented upload status request
+    response = AuthorizedSession(get_credentials()).put(
+        upload_uri, headers={'Content-Range': f'bytes */{size}', 'Content-Length': '0'}, timeout=60
+    )
+    if response.status_code in (200, 201):
+        return size, response.json()
+    if response.status_code == 308:
+        # No Range header means Drive has none of the bytes yet
+        received = response.headers.get('Range')
+        return (int(received.rsplit('-', 1)[1]) + 1 if received else 0), None
+    response.raise_for_status()
+    raise RuntimeError(f'Unexpected upload status {response.status_code} for {upload_uri}')
+
+@metrics.timed('upload')
+def upload_file(folder_id: str, file_name: str, folder: str, mimetype: str) -> str:
+    from googleapiclient.errors import HttpError
+    file_path = f"{folder}/{file_name}"
+    if not os.path.exists(file_path):
+        return 'N/A'
+    store = get_state_store()
+    session_key = f'{folder_id}/{file_name}'
+    stat = os.stat(file_path)
+    metrics.annotate(file=file_name, bytes=stat.st_size)
+    request = create_upload_request(folder_id, file_name, file_path, mimetype)
+    saved = store.get('upload_sessions', session_key)
+    response = None
+    if saved and saved['size'] == stat.st_size and saved['mtime'] == stat.st_mtime:
+        # Continue an interrupted upload from however many bytes Drive already has
+        try:
+            offset, response = query_upload_offset(saved['uri'], stat.st_size)
+            print(f'Resuming upload of {file_name} from {offset} bytes')
+            request.resumable_uri = saved['uri']
+            request.resumable_progress = offset
+        except requests.HTTPError as e:
+            if e.response.status_code not in (404, 410):
+                raise
+            # The saved session expired, start the upload over
+            metrics.inc('retries_total', upstream='drive')
+            store.delete('upload_sessions', session_key)
+            saved = None
+    while response is None:
+        acquire_api('drive')
+        try:
+            status, response = request.next_chunk(num_retries=3)
+        except HttpError as e:
+            if not saved or e.resp.status not in (404, 410):
+                raise
+            # The saved session expired, start the upload over
+            metrics.inc('retries_total', upstream='drive')
+            store.delete('upload_sessions', session_key)
+            saved = None
+            request = create_upload_request(folder_id, file_name, file_path, mimetype)
+            continue
+        if status:
+            store.set('upload_sessions', session_key, {
+                'uri': request.resumable_uri,
+                'offset': status.resumable_progress,
+                'size': stat.st_size,
+                'mtime': stat.st_mtime
+            })
+            print(f'Uploading {file_name}: {int(status.progress() * 100)}%')
+    store.delete('upload_sessions', session_key)
+    drive_listing.add(folder_id, response['id'], file_name, mimetype)
+    return response.get('id')
 
-def send_discord_notification(webhook_url: str, file_id: str, internal_id: str):
+def send_discord_notification(file_id: str, internal_id: str):
+    # Queued on disk and sent in batches by the outbox thread, so this never blocks an upload
     drive_link = f"https://drive.google.com/file/d/{file_id}/view"
-    embed = {
+    get_discord_outbox().put({
         "description": f"Video uploaded: [{internal_id}]({drive_link})",
         "color": 5814783
-    }
-    payload = { "embeds": [embed] }
+    })
+
+def file_digest(file_path: str) -> tuple[str, int]:
+    """MD5 (as Drive reports it in md5Checksum) and size of a file, in one pass over a memory map."""
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if not size:
+            return hashlib.md5().hexdigest(), 0
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return hashlib.md5(data).hexdigest(), size
+
+def get_encoded_digest(internal_id: str) -> tuple[str, int]:
+    file_path = f'encoded/{internal_id}.mp4'
+    artifact = get_artifact(internal_id)
+    if artifact.get('md5') and artifact.get('size') == os.path.getsize(file_path):
+        return artifact['md5'], artifact['size']
+    # Encoded before digests were kept in the manifest
+    md5, size = file_digest(file_path)
+    set_artifact_stage(internal_id, artifact.get('stage', 'encoded'), size=size, md5=md5)
+    return md5, size
+
+def is_upload_verified(file_id: str, md5: str, size: int) -> bool:
+    acquire_api('drive')
+    remote = get_drive_service().files().get(fileId=file_id, fields='md5Checksum,size', supportsAllDrives=True).execute()
+    return int(remote.get('size', -1)) == size and remote.get('md5Checksum') == md5
+
+def discard_drive_file(folder_id: str, file_id: str):
+    acquire_api('drive')
+    get_drive_service().files().update(fileId=file_id, body={'trashed': True}, supportsAllDrives=True).execute()
+    drive_listing.remove(folder_id, file_id)
+
+def upload_verified(upload, folder_id: str, file_name: str, md5: str, size: int, attempts: int = 2) -> str:
+    """Run `upload` until Drive's copy matches md5 and size, trashing copies that don't."""
+    for _ in range(attempts):
+        file_id = upload()
+        if file_id == 'N/A' or is_upload_verified(file_id, md5, size):
+            return file_id
+        print(f'Drive copy of {file_name} does not match the local file, uploading it again')
+        metrics.inc('retries_total', upstream='drive', reason='checksum')
+        discard_drive_file(folder_id, file_id)
+    return 'N/A'
+
+def release_video(internal_id: str):
+    for file_path in (f'downloaded/{internal_id}.mp4', f'encoded/{internal_id}.mp4'):
+        if os.path.exists(file_path):
+            os.remove(file_path)
+    set_artifact_stage(internal_id, 'released')
+
+def verify_direct_download(internal_id: str) -> bool:
+    """Probe a direct download whose first probe failed, returning whether it can be uploaded as is."""
+    file_path = f'encoded/{internal_id}.mp4'
     try:
-        response = requests.post(webhook_url, json=payload)
-        response.raise_for_status()
-        return True
+        probe = probe_media(file_path)
     except Exception as e:
-        print(f"Failed to send Discord notification: {e}")
+        print(f'Still cannot probe {file_path}, not uploading it: {e}')
+        set_artifact_stage(internal_id, 'unverified', probe_error=str(e))
         return False
+    if not get_encode_profile(internal_id).can_copy(probe):
+        shutil.move(file_path, f'downloaded/{internal_id}.mp4')
+        set_artifact_stage(internal_id, 'downloaded', size=probe['size'], probe_error=None)
+        return False
+    md5, size = file_digest(file_path)
+    set_artifact_stage(internal_id, 'encoded', size=size, md5=md5, probe_error=None)
+    return True
+
+def upload_video(key: str, internal_id: str) -> str:
+    folder_id = index[key].video_drive_id
+    file_name = f'{internal_id}.mp4'
+    if not os.path.exists(f'encoded/{file_name}'):
+        return 'N/A'
+    if get_artifact(internal_id).get('stage') == 'unverified' and not verify_direct_download(internal_id):
+        return 'N/A'
+    artifact = get_artifact(internal_id)
+    if artifact.get('stage') != 'encoded':
+        # Still being written, or left behind without a manifest entry by an earlier version
+        return 'N/A'
+    # Only a digest recorded when the encode finished shows Drive holds the real encode,
+    # one taken now would just match whatever happens to be on disk
+    releasable = bool(artifact.get('md5')) and artifact.get('size') == os.path.getsize(f'encoded/{file_name}')
+    md5, size = get_encoded_digest(internal_id)
+    file_id = upload_verified(lambda: upload_file(folder_id, file_name, 'encoded', 'video/mp4'), folder_id, file_name, md5, size)
+    if file_id == 'N/A':
+        return file_id
+    set_artifact_stage(internal_id, 'uploaded', drive_id=file_id)
+    if config.RELEASE_UPLOADED_FILES and releasable:
+        release_video(internal_id)
+    elif config.RELEASE_UPLOADED_FILES:
+        print(f'Keeping local copies of {internal_id}: no digest from its encode to confirm the upload against')
+    if config.DISCORD_WEBHOOK_URL:
+        send_discord_notification(file_id, internal_id)
+    return file_id
 
 def upload_videos(key: str):
-    creator_sheet = sheet.worksheet(key)
-    records = creator_sheet.get_all_records()
-    folder_id = index[key]['video_drive_id']
     videos_to_upload = [
-        (record['Internal ID'])
-        for record in records
-        if record['Status'] == 'indexed' and record['Internal ID']
+        video.internal_id
+        for video in get_creator_columns(key, ['Internal ID', 'Status'])
+        if video.status == 'indexed' and video.internal_id
+        and get_artifact(video.internal_id).get('stage') not in UPLOADED_STAGES
     ]
-    for internal_id in videos_to_upload:
-        file_id = upload_file(folder_id, f"{internal_id}.mp4", 'encoded', 'video/mp4')
-        if file_id != 'N/A' and config.DISCORD_WEBHOOK_URL:
-            send_discord_notification(config.DISCORD_WEBHOOK_URL, file_id, internal_id)
-
-def gspread_retry(func, max_retries=3, *args, **kwargs):
-    for attempt in range(max_retries):
-        try:
-            return func(*args, **kwargs)
-        except (requests.exceptions.ConnectionError,
-                requests.exceptions.Timeout,
-                gspread.exceptions.APIError) as e:
-            if attempt < max_retries - 1:
-                wait_time = 2 ** attempt
-                print(f"gspread call failed, retrying in {wait_time}s... ({e})")
-                time.sleep(wait_time)
-            else:
-                print(f"gspread call failed after {max_retries} attempts")
-                raise
+    with ThreadPoolExecutor(max_workers=max(1, config.UPLOAD_WORKERS)) as executor:
+        futures = {executor.submit(upload_video, key, internal_id): internal_id for internal_id in videos_to_upload}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f'Upload failed for {futures[future]}: {e}')
 
+@creator_locked
 def update_sheet_info(key: str):
     """Update sheet info for a specific creator key"""
     try:
-        creator_sheet = gspread_retry(sheet.worksheet, 3, key)
-        records = gspread_retry(creator_sheet.get_all_records, 3)
-
-        video_index = {}
-        for record in records:
-            video_data = video_index.setdefault(record['YouTube ID'], {})
-            video_data['internal_id'] = record['Internal ID'] or None
-            video_data['status'] = record['Status'] or None
-
-        video_ids = list(video_index.keys())
-
-
-        time.sleep(0.5)
-
-        check_uploaded_videos(index, key, video_ids, video_index)
-
-        rows = [['YouTube ID', 'YouTube Link', 'Internal ID', 'Status', 'Title', 'Publish Date', 'Duration', 'Description', 'Ad Timestamps', 'Thumbnail', 'Tags', 'Views', 'Likes', 'Comments']]
-        for record in records:
-            yt_id = record['YouTube ID']
-            row = [
-                yt_id,
-                f"https://www.youtube.com/watch?v={yt_id}",
-                video_index[yt_id].get('internal_id', record['Internal ID']),
-                video_index[yt_id].get('status', record['Status']),
-                record['Title'],
-                record['Publish Date'],
-                record['Duration'],
-                record['Description'],
-                record['Ad Timestamps'],
-                record['Thumbnail'],
-                record['Tags'],
-                record['Views'],
-                record['Likes'],
-                record['Comments']
-            ]
-            rows.append(row)
-
-        gspread_retry(creator_sheet.clear, 3)
-        gspread_retry(creator_sheet.update, 3, rows, 'A1')
+        videos = get_creator_columns(key, ['YouTube ID', 'Internal ID', 'Status'])
+        video_index = {video.yt_id: video for video in videos}
+        check_uploaded_videos(index, key, list(video_index), video_index)
+        set_creator_columns(key, videos, ['Internal ID', 'Status'])
 
     except Exception as e:
         print(f"Error updating sheet info for {key}: {e}")
         raise
 
+JPEG_START = b'\xff\xd8'
+JPEG_END = b'\xff\xd9'
+
+def is_valid_jpeg(file_path: str) -> bool:
+    # Truncated downloads and HTML error pages fail the start/end marker check
+    if os.path.getsize(file_path) < 4:
+        return False
+    with open(file_path, 'rb') as f:
+        head = f.read(2)
+        f.seek(-2, os.SEEK_END)
+        return head == JPEG_START and f.read(2) == JPEG_END
+
+@metrics.timed('upload')
+def upload_bytes(folder_id: str, file_name: str, data: bytes, mimetype: str) -> str:
+    from googleapiclient.http import MediaIoBaseUpload
+    metrics.annotate(file=file_name, bytes=len(data))
+    acquire_api('drive')
+    # Small enough for a single multipart request, no resumable session needed
+    response = get_drive_service().files().create(
+        body={'name': file_name, 'parents': [folder_id]},
+        media_body=MediaIoBaseUpload(io.BytesIO(data), mimetype=mimetype, resumable=False),
+        fields='id',
+        supportsAllDrives=True
+    ).execute(num_retries=3)
+    drive_listing.add(folder_id, response['id'], file_name, mimetype)
+    return response['id']
+
+async def fetch_thumbnail_async(session_async: aiohttp.ClientSession, url: str) -> bytes:
+    async with session_async.get(url) as response:
+        response.raise_for_status()
+        return await response.read()
+
+async def download_thumbnail_async(session_async: aiohttp.ClientSession, url: str, file_path: str) -> tuple[str, int]:
+    """Stream a thumbnail to file_path, returning the MD5 and size of what was written."""
+    md5 = hashlib.md5()
+    size = 0
+    async with session_async.get(url) as response:
+        response.raise_for_status()
+        # Written under a temporary name so an interrupted download is never mistaken for a thumbnail
+        with open(f'{file_path}.part', 'wb') as f:
+            async for chunk in response.content.iter_chunked(64 * 1024):
+                f.write(chunk)
+                md5.update(chunk)
+                size += len(chunk)
+    os.replace(f'{file_path}.part', file_path)
+    return md5.hexdigest(), size
+
+async def archive_thumbnail_async(session_async: aiohttp.ClientSession, upload_slots: asyncio.Semaphore, folder_id: str, internal_id: str, url: str) -> str:
+    file_name = f'{internal_id}_TN.jpg'
+    file_path = f'thumbnails/{file_name}'
+    try:
+        if config.THUMBNAILS_IN_MEMORY:
+            data = await fetch_thumbnail_async(session_async, url)
+            if data[:2] != JPEG_START or data[-2:] != JPEG_END:
+                print(f'Invalid thumbnail for {internal_id}, skipping it')
+                return 'N/A'
+            async with upload_slots:
+                return await asyncio.to_thread(
+                    upload_verified, lambda: upload_bytes(folder_id, file_name, data, 'image/jpeg'),
+                    folder_id, file_name, hashlib.md5(data).hexdigest(), len(data)
+                )
+        if os.path.exists(file_path):
+            md5, size = file_digest(file_path)
+        else:
+            md5, size = await download_thumbnail_async(session_async, url, file_path)
+        if not is_valid_jpeg(file_path):
+            print(f'Invalid thumbnail for {internal_id}, removing it')
+            os.remove(file_path)
+            return 'N/A'
+        async with upload_slots:
+            file_id = await asyncio.to_thread(
+                upload_verified, lambda: upload_file(folder_id, file_name, 'thumbnails', 'image/jpeg'),
+                folder_id, file_name, md5, size
+            )
+        if file_id != 'N/A' and config.RELEASE_UPLOADED_FILES:
+            os.remove(file_path)
+        return file_id
+    except Exception as e:
+        print(f'Thumbnail failed for {internal_id}: {e}')
+        return 'N/A'
+
+async def archive_thumbnails_async(folder_id: str, thumbnails: list[tuple[str, str]]) -> list[str]:
+    # Downloads share one pool of THUMBNAIL_CONCURRENCY connections; Drive uploads run in threads alongside them
+    upload_slots = asyncio.Semaphore(config.THUMBNAIL_UPLOAD_WORKERS)
+    connector = aiohttp.TCPConnector(limit=config.THUMBNAIL_CONCURRENCY)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=60)) as session_async:
+        return await asyncio.gather(*[
+            archive_thumbnail_async(session_async, upload_slots, folder_id, internal_id, url)
+            for internal_id, url in thumbnails
+        ])
+
 def upload_thumbnails(index: dict, key: str):
-    folder_id = index[key]['thumbnail_drive_id']
-    files = get_files_in_folder(folder_id)
-    existing_ids = [str(file['name']).removesuffix('_TN.jpg') for file in files if file['mimeType'] == 'image/jpeg']
-    creator_sheet = sheet.worksheet(key)
-    records = creator_sheet.get_all_records()
-    for record in records:
-        internal_id = record['Internal ID']
-        if record['Status'] == 'invalid':
-            continue
-        if not internal_id in existing_ids:
-            file_path = f'thumbnails/{internal_id}_TN.jpg'
-            if not os.path.exists(file_path):
-                resp = requests.get(record['Thumbnail'])
-                with open(file_path, 'wb') as out_file:
-                    out_file.write(resp.content)
-            resp = upload_file(folder_id, f"{internal_id}_TN.jpg", 'thumbnails', 'image/jpeg')
-            print(resp)
+    folder_id = index[key].thumbnail_drive_id
+    existing_ids = {name.removesuffix('_TN.jpg') for name in drive_listing.names(folder_id, 'image/jpeg')}
+    thumbnails = [
+        (video.internal_id, video.thumbnail)
+        for video in get_creator_columns(key, ['Internal ID', 'Status', 'Thumbnail'])
+        if video.status != 'invalid' and video.internal_id and video.thumbnail
+        and video.internal_id not in existing_ids
+    ]
+    if not thumbnails:
+        return
+    os.makedirs('thumbnails', exist_ok=True)
+    file_ids = asyncio.run(archive_thumbnails_async(folder_id, thumbnails))
+    uploaded = sum(file_id != 'N/A' for file_id in file_ids)
+    print(f'Uploaded {uploaded} of {len(thumbnails)} thumbnails: {key}')
 
-if __name__ == '__main__':
-    print('Started')
-    index, creator_keys = extract_creator_index()
-    for key in creator_keys:
+@creator_locked
+def refresh_video_stats(key: str):
+    stat_columns = ['Views', 'Likes', 'Comments']
+    videos = get_creator_columns(key, ['YouTube ID', 'Status'] + stat_columns)
+    video_ids = [video.yt_id for video in videos if video.status not in ('invalid', 'unlisted')]
+    youtube = get_youtube_client()
+    stats = youtube.run(youtube.get_videos(video_ids, 'statistics', STATS_FIELDS))
+    for video in videos:
+        statistics = stats.get(video.yt_id, {}).get('statistics')
+        if statistics:
+            video.views = statistics.get('viewCount', '0')
+            video.likes = statistics.get('likeCount', '0')
+            video.comments = statistics.get('commentCount', '0')
+    set_creator_columns(key, videos, stat_columns)
+    print(f'Refreshed stats: {key}')
+
+def run_stats(creator_keys: list[str]):
+    for_each_creator(creator_keys, refresh_video_stats, 'Error refreshing stats for')
+    flush_sheet_mirror()
+
+def for_each_creator(creator_keys: list[str], func, error_message: str):
+    # Creators run CREATOR_WORKERS at a time; the governor keeps them inside the API quotas
+    def run(key: str):
         try:
-            index_videos(index, key)
-            index.get('archive_videos', True)
-            print(f'Indexed: {key}')
+            func(key)
+        except Exception as e:
+            print(f'{error_message} {key}: {e}')
+    with ThreadPoolExecutor(max_workers=max(1, config.CREATOR_WORKERS)) as executor:
+        for future in as_completed([executor.submit(run, key) for key in creator_keys]):
+            future.result()
+
+PIPELINE_DONE = object()
 
-            if index[key].get('archive_videos', True):
-                download_videos(key)
-                print(f'Downloaded: {key}')
+def start_stage(name: str, func, inbox: queue.Queue, outbox: queue.Queue | None, workers: int, on_finish) -> list[threading.Thread]:
+    """Start `workers` threads feeding jobs from `inbox` through `func`.
+
+    A job that `func` returns is handed to `outbox`; a job that fails, is dropped
+    (returns None) or leaves the last stage is passed to `on_finish`.
+    """
+    def worker():
+        while True:
+            job = inbox.get()
+            if job is PIPELINE_DONE:
+                inbox.put(PIPELINE_DONE)
+                return
+            try:
+                result = func(job)
+            except Exception as e:
+                print(f"Pipeline {name} failed for {job['internal_id']}: {e}")
+                result = None
+            if result is not None and outbox is not None:
+                outbox.put(result)
             else:
-                print(f'Skipped download: {key} (archive_videos is False)')
-        except Exception as e:
-            print(f'Error processing {key}: {e}')
-            continue
+                on_finish(job)
+    threads = [threading.Thread(target=worker, name=f'{name}-{i}', daemon=True) for i in range(max(1, workers))]
+    for thread in threads:
+        thread.start()
+    return threads
+
+def finish_stage(threads: list[threading.Thread], inbox: queue.Queue, outbox: queue.Queue | None):
+    inbox.put(PIPELINE_DONE)
+    for thread in threads:
+        thread.join()
+    if outbox is not None:
+        outbox.put(PIPELINE_DONE)
+
+def run_pipeline(index: dict, creator_keys: list[str]):
+    # Every job holds a slot from the start of its download until its upload is done,
+    # which caps how many finished-but-not-uploaded files can sit on disk
+    pending_slots = threading.BoundedSemaphore(config.MAX_PENDING_UPLOADS)
+    download_queue = queue.Queue(maxsize=config.DOWNLOAD_WORKERS * 2)
+    encode_queue = queue.Queue(maxsize=config.ENCODE_WORKERS * 2)
+    upload_queue = queue.Queue(maxsize=config.UPLOAD_WORKERS * 2)
+
+    def download_stage(job: dict):
+        pending_slots.acquire()
+        job['has_slot'] = True
+        # Uploads in flight free up space, so wait for them before giving up on this download
+        wait_for_disk_space(config.DISK_WAIT_MINUTES * 60, MEDIA_DIRS)
+        if download_video(job['yt_id'], job['internal_id'], job['duration']):
+            return job
+
+    def encode_stage(job: dict):
+        input_path = f"downloaded/{job['internal_id']}.mp4"
+        output_path = f"encoded/{job['internal_id']}.mp4"
+        if not os.path.exists(output_path) and not is_complete_download(input_path, job['duration']):
+            return
+        if os.path.exists(output_path) or reencode_video(input_path, output_path, config.ENCODE_THREADS_PER_JOB):
+            return job
+        print(f"Encode failed: {job['internal_id']}")
+
+    def upload_stage(job: dict):
+        if upload_video(job['key'], job['internal_id']) == 'N/A':
+            print(f"Upload failed: {job['internal_id']}")
+        else:
+            print(f"Uploaded: {job['internal_id']}")
+
+    def finish_job(job: dict):
+        if job.pop('has_slot', False):
+            pending_slots.release()
+
+    upload_threads = start_stage('upload', upload_stage, upload_queue, None, config.UPLOAD_WORKERS, finish_job)
+    encode_threads = start_stage('encode', encode_stage, encode_queue, upload_queue, config.ENCODE_WORKERS, finish_job)
+    download_threads = start_stage('download', download_stage, download_queue, encode_queue, config.DOWNLOAD_WORKERS, finish_job)
+
+    def queue_creator(key: str):
+        index_videos(index, key)
+        print(f'Indexed: {key}')
+        if not index[key].archive_videos:
+            print(f'Skipped download: {key} (archive_videos is False)')
+            return
+        for yt_id, internal_id, duration in get_videos_to_download(key):
+            download_queue.put({'key': key, 'yt_id': yt_id, 'internal_id': internal_id, 'duration': duration})
+        print(f'Queued: {key}')
 
-    encode_videos()
+    def finish_creator(key: str):
+        update_sheet_info(key)
+        upload_thumbnails(index, key)
+        print(f'Uploaded: {key}')
+
+    for_each_creator(creator_keys, queue_creator, 'Error processing')
+    finish_stage(download_threads, download_queue, encode_queue)
+    finish_stage(encode_threads, encode_queue, upload_queue)
+    finish_stage(upload_threads, upload_queue, None)
+    for_each_creator(creator_keys, finish_creator, 'Error uploading for')
+    flush_sheet_mirror()
+
+def run_serial(index: dict, creator_keys: list[str]):
+    def download_creator(key: str):
+        index_videos(index, key)
+        print(f'Indexed: {key}')
+        if index[key].archive_videos:
+            download_videos(key)
+            print(f'Downloaded: {key}')
+        else:
+            print(f'Skipped download: {key} (archive_videos is False)')
+
+    def upload_creator(key: str):
+        upload_videos(key)
+        update_sheet_info(key)
+        upload_thumbnails(index, key)
+        print(f'Uploaded: {key}')
+
+    for_each_creator(creator_keys, download_creator, 'Error processing')
+    flush_sheet_mirror()
+    encode_videos(get_expected_durations(creator_keys))
     print(f'Encoded')
+    for_each_creator(creator_keys, upload_creator, 'Error uploading for')
+    flush_sheet_mirror()
 
-    for key in creator_keys:
+def run_index(index: dict, creator_keys: list[str]):
+    for_each_creator(creator_keys, lambda key: index_videos(index, key), 'Error processing')
+    flush_sheet_mirror()
+
+def run_downloads(index: dict, creator_keys: list[str]):
+    archived_keys = [key for key in creator_keys if index[key].archive_videos]
+    for_each_creator(archived_keys, download_videos, 'Error downloading for')
+    flush_sheet_mirror()
+
+def run_uploads(index: dict, creator_keys: list[str]):
+    for_each_creator(creator_keys, upload_videos, 'Error uploading for')
+    for_each_creator(creator_keys, update_sheet_info, 'Error updating sheet for')
+    flush_sheet_mirror()
+
+def run_thumbnails(index: dict, creator_keys: list[str]):
+    for_each_creator(creator_keys, lambda key: upload_thumbnails(index, key), 'Error uploading thumbnails for')
+
+def run_daemon(index: dict, creator_keys: list[str]):
+    """Keep clients and caches warm and run each stage on its own interval.
+
+    A small HTTP server on DAEMON_PORT serves GET /health, GET /queues, GET /metrics
+    and POST /sync/<key>, which indexes and downloads one creator straight away.
+    """
+    started = time.time()
+    stages: dict[str, dict] = {}
+    sync_requests = queue.Queue()
+    # The index stage swaps in a new (index, creator_keys) pair in one assignment;
+    # every other stage takes the current pair when it starts and works from that
+    creators = [(index, creator_keys)]
+    if config.DISCORD_WEBHOOK_URL:
+        # Starts the outbox thread, which sends anything an earlier run left queued
+        get_discord_outbox()
+
+    def run_stage(name: str, func):
+        stage = stages.setdefault(name, {'runs': 0, 'running': False, 'last_error': None})
+        stage['running'] = True
+        stage_started = time.time()
+        # Every stage run reads the sheets afresh, they may have been edited by hand
+        clear_creator_columns()
         try:
-            upload_videos(key)
-            update_sheet_info(key)
-            time.sleep(1)
-            upload_thumbnails(index, key)
-            print(f'Uploaded: {key}')
+            func()
+            stage['last_error'] = None
         except Exception as e:
-            print(f'Error uploading for {key}: {e}')
-            continue
+            stage['last_error'] = str(e)
+            print(f'Daemon stage {name} failed: {e}')
+        finally:
+            stage.update(running=False, runs=stage['runs'] + 1, last_run=stage_started, last_duration=time.time() - stage_started)
+            metrics.write_textfile(config.METRICS_TEXTFILE)
+
+    def schedule(name: str, func, interval_minutes: float):
+        def loop():
+            while True:
+                run_stage(name, func)
+                time.sleep(interval_minutes * 60)
+        threading.Thread(target=loop, name=f'daemon-{name}', daemon=True).start()
+
+    def index_stage():
+        drive_listing.expire()
+        new_index, new_keys = extract_creator_index()
+        replace_index(new_index)
+        creators[0] = (new_index, new_keys)
+        run_index(new_index, new_keys)
+
+    def download_stage():
+        drive_listing.expire()
+        run_downloads(*creators[0])
+
+    def encode_stage():
+        _, creator_keys = creators[0]
+        encode_videos(get_expected_durations(creator_keys))
+
+    def upload_stage():
+        drive_listing.expire()
+        index, creator_keys = creators[0]
+        run_uploads(index, creator_keys)
+        run_thumbnails(index, creator_keys)
+
+    def stats_stage():
+        _, creator_keys = creators[0]
+        run_stats(creator_keys)
+
+    def sync_loop():
+        while True:
+            key = sync_requests.get()
+            def sync_creator():
+                index, _ = creators[0]
+                index_videos(index, key)
+                if index[key].archive_videos:
+                    download_videos(key)
+                flush_sheet_mirror()
+            run_stage(f'sync:{key}', sync_creator)
+
+    class DaemonHandler(BaseHTTPRequestHandler):
+        def send_json(self, status: int, body: dict):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == '/health':
+                snapshot = {name: dict(stage) for name, stage in list(stages.items())}
+                self.send_json(200, {'status': 'ok', 'uptime': time.time() - started, 'stages': snapshot})
+            elif self.path == '/metrics':
+                data = metrics.prometheus().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            elif self.path == '/queues':
+                self.send_json(200, {
+                    'sync': sync_requests.qsize(),
+                    'encode': len(get_downloaded_files()),
+                    'upload': len(list(Path('encoded').glob('*.mp4')))
+                })
+            else:
+                self.send_json(404, {'error': 'not found'})
+
+        def do_POST(self):
+            key = self.path.removeprefix('/sync/')
+            if not self.path.startswith('/sync/') or key not in creators[0][1]:
+                self.send_json(404, {'error': f'unknown creator: {key}'})
+                return
+            sync_requests.put(key)
+            self.send_json(202, {'queued': key})
+
+        def log_message(self, format, *args):
+            pass
+
+    schedule('index', index_stage, config.INDEX_INTERVAL_MINUTES)
+    schedule('download', download_stage, config.DOWNLOAD_INTERVAL_MINUTES)
+    schedule('encode', encode_stage, config.ENCODE_INTERVAL_MINUTES)
+    schedule('upload', upload_stage, config.UPLOAD_INTERVAL_MINUTES)
+    schedule('stats', stats_stage, config.STATS_INTERVAL_MINUTES)
+    threading.Thread(target=sync_loop, name='daemon-sync', daemon=True).start()
+    # docker stop sends SIGTERM; treat it like Ctrl+C so the CLI's shutdown code still runs
+    signal.signal(signal.SIGTERM, stop_daemon)
+    server = ThreadingHTTPServer(('', config.DAEMON_PORT), DaemonHandler)
+    print(f'Daemon listening on port {config.DAEMON_PORT}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print('Daemon stopping')
+    finally:
+        server.server_close()
+
+def stop_daemon(signum, frame):
+    raise KeyboardInterrupt
+
+COMMANDS = {
+    'run': 'index, download, encode and upload (the default)',
+    'index': 'index new videos into the creator sheets',
+    'download': 'download indexed videos',
+    'encode': 'encode downloaded videos',
+    'upload': 'upload encoded videos and update the creator sheets',
+    'thumbnails': 'upload missing thumbnails',
+    'stats': 'refresh views, likes and comments',
+    'daemon': 'keep running and run every stage on its own interval',
+}
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Archive YouTube creators to Google Drive.')
+    parser.set_defaults(command='run', keys=[])
+    commands = parser.add_subparsers(dest='command')
+    for name, help_text in COMMANDS.items():
+        command = commands.add_parser(name, help=help_text)
+        if name != 'daemon':
+            command.add_argument('keys', nargs='*', metavar='key', help='creator keys to process (default: all)')
+    return parser.parse_args(argv)
+
+def select_creators(keys: list[str], refresh: bool) -> tuple[dict, list[str]]:
+    """Read the creator index, looking up new channels first if `refresh`, and narrow it to `keys`."""
+    if refresh:
+        index, creator_keys = extract_creator_index()
+    else:
+        index = get_sheet_index()
+        creator_keys = get_creator_keys(index)
+    unknown = [key for key in keys if key not in creator_keys]
+    if unknown:
+        sys.exit(f"Unknown creator keys: {', '.join(unknown)}")
+    return index, [key for key in creator_keys if key in keys] if keys else creator_keys
+
+if __name__ == '__main__':
+    args = parse_args()
+    load_cli_encode_profiles()
+    print('Started')
+    if args.command == 'encode':
+        # Encoding works from the files on disk and the state database, without signing in to anything.
+        # Creator profiles are only stored with USE_STATE_DB; otherwise everyone gets ENCODE_PROFILE.
+        if config.USE_STATE_DB:
+            index = {key: CreatorRecord.from_sheet(record) for key, record in get_state_store().get_creators().items()}
+        creator_keys = args.keys or get_downloaded_creator_keys()
+        encode_videos(get_stored_durations(creator_keys), creator_keys)
+    elif args.command == 'daemon':
+        index, creator_keys = select_creators([], refresh=True)
+        run_daemon(index, creator_keys)
+    else:
+        index, creator_keys = select_creators(args.keys, refresh=args.command in ('run', 'index'))
+        if args.command == 'index':
+            run_index(index, creator_keys)
+        elif args.command == 'download':
+            run_downloads(index, creator_keys)
+        elif args.command == 'upload':
+            run_uploads(index, creator_keys)
+        elif args.command == 'thumbnails':
+            run_thumbnails(index, creator_keys)
+        elif args.command == 'stats':
+            run_stats(creator_keys)
+        elif config.PIPELINE_MODE == 'pipelined':
+            run_pipeline(index, creator_keys)
+        else:
+            run_serial(index, creator_keys)
+    if youtube_client:
+        print(f'YouTube API: {youtube_client.quota_used} quota units, calls: {youtube_client.calls}')
+        youtube_client.close()
+    if config.DISCORD_WEBHOOK_URL:
+        # Whatever can't be sent in time stays queued for the next run
+        get_discord_outbox().close(config.DISCORD_FLUSH_SECONDS)
+    metrics.write_textfile(config.METRICS_TEXTFILE)
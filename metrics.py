@@ -0,0 +1,92 @@
+import functools
+import json
+import os
+import threading
+import time
+
+
+def escape_label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metrics:
+    """Counters and per-stage timings, exported as JSON lines and Prometheus text.
+
+    Stage functions are wrapped with `timed`; while one runs, `annotate` adds fields
+    (bytes moved, failure reason, ...) to the record that is logged when it returns.
+    A stage that raises or returns False is counted as failed.
+    """
+
+    def __init__(self, log_path: str | None = None):
+        self.log_path = log_path
+        self.values: dict[tuple[str, tuple], float] = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + value
+
+    def annotate(self, **fields):
+        record = getattr(self.local, 'record', None)
+        if record is not None:
+            record.update(fields)
+
+    def timed(self, stage: str):
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                record = {'stage': stage}
+                parent = getattr(self.local, 'record', None)
+                self.local.record = record
+                started = time.monotonic()
+                try:
+                    result = func(*args, **kwargs)
+                    if result is False:
+                        record.setdefault('status', 'failed')
+                    return result
+                except Exception as e:
+                    record['status'] = 'failed'
+                    record.setdefault('reason', str(e))
+                    raise
+                finally:
+                    self.local.record = parent
+                    record['duration'] = time.monotonic() - started
+                    record.setdefault('status', 'ok')
+                    self.finish(record)
+            return wrapper
+        return decorator
+
+    def finish(self, record: dict):
+        stage = record['stage']
+        self.inc('stage_runs_total', stage=stage, status=record['status'])
+        self.inc('stage_seconds_total', record['duration'], stage=stage)
+        if record.get('bytes'):
+            self.inc('stage_bytes_total', record['bytes'], stage=stage)
+        self.log({'time': time.time(), **record})
+
+    def log(self, record: dict):
+        if not self.log_path:
+            return
+        line = json.dumps(record, default=str)
+        with self.lock:
+            os.makedirs(os.path.dirname(self.log_path) or '.', exist_ok=True)
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+    def prometheus(self) -> str:
+        with self.lock:
+            items = sorted(self.values.items())
+        lines = []
+        for (name, labels), value in items:
+            label_text = ','.join(f'{k}="{escape_label(v)}"' for k, v in labels)
+            lines.append(f'sauce_{name}{{{label_text}}} {value:g}' if label_text else f'sauce_{name} {value:g}')
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path: str):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus())
+        os.replace(tmp_path, path)
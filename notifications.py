@@ -0,0 +1,107 @@
+import itertools
+import threading
+import time
+
+import requests
+
+from metrics import Metrics
+from state import StateStore
+
+MAX_EMBEDS = 10
+RETRY_SECONDS = 60
+
+
+class DiscordOutbox:
+    """Discord webhook embeds queued in the state store and sent by a background thread.
+
+    `put` only records the embed, so uploads never wait on Discord. The worker packs
+    up to MAX_EMBEDS queued embeds into each message, waits out 429s and the
+    webhook's X-RateLimit headers, and deletes embeds once Discord has them.
+    Anything still queued when the process exits is sent on the next run.
+    """
+
+    def __init__(self, webhook_url: str, store: StateStore, metrics: Metrics, linger_seconds: float = 2):
+        self.webhook_url = webhook_url
+        self.store = store
+        self.metrics = metrics
+        self.linger_seconds = linger_seconds
+        self.session = requests.Session()
+        self.sequence = itertools.count()
+        self.pending = threading.Event()
+        self.closing = threading.Event()
+        # Set from the start so embeds left over from an earlier run go out first
+        self.pending.set()
+        self.thread = threading.Thread(target=self.run, name='discord-outbox', daemon=True)
+        self.thread.start()
+
+    def put(self, embed: dict):
+        self.store.set('discord_outbox', f'{time.time_ns():020d}-{next(self.sequence):06d}', embed)
+        self.pending.set()
+
+    def close(self, timeout: float):
+        self.closing.set()
+        self.pending.set()
+        self.thread.join(timeout)
+
+    def run(self):
+        while True:
+            self.pending.wait()
+            if not self.closing.is_set():
+                # Let a burst of uploads land in the same message
+                self.closing.wait(self.linger_seconds)
+            self.pending.clear()
+            try:
+                while self.send_batch():
+                    pass
+                queued = bool(self.store.items('discord_outbox'))
+            except Exception as e:
+                # A dead worker would leave every later embed unsent, so log it and carry on
+                print(f'Discord outbox failed, retrying in {RETRY_SECONDS}s: {e}')
+                queued = True
+            if self.closing.is_set():
+                return
+            if queued:
+                # Discord is still failing; try again later instead of waiting for the next put()
+                self.closing.wait(RETRY_SECONDS)
+                self.pending.set()
+
+    def send_batch(self) -> bool:
+        """Send the oldest queued embeds, returning whether any were sent."""
+        batch = sorted(self.store.items('discord_outbox').items())[:MAX_EMBEDS]
+        if not batch or not self.post([embed for _, embed in batch]):
+            return False
+        for key, _ in batch:
+            self.store.delete('discord_outbox', key)
+        return True
+
+    def post(self, embeds: list[dict]) -> bool:
+        for attempt in range(5):
+            self.metrics.inc('api_requests_total', upstream='discord')
+            try:
+                response = self.session.post(self.webhook_url, json={'embeds': embeds}, timeout=10)
+            except requests.RequestException as e:
+                print(f'Discord notification failed, retrying in {2 ** attempt}s: {e}')
+                self.metrics.inc('retries_total', upstream='discord')
+                time.sleep(2 ** attempt)
+                continue
+            if response.status_code == 429:
+                try:
+                    retry_after = float(response.json()['retry_after'])
+                except (ValueError, KeyError, TypeError):
+                    retry_after = float(response.headers.get('Retry-After', 2 ** attempt))
+                self.metrics.inc('retries_total', upstream='discord', status=429)
+                time.sleep(retry_after)
+                continue
+            if response.status_code >= 500:
+                self.metrics.inc('retries_total', upstream='discord', status=response.status_code)
+                time.sleep(2 ** attempt)
+                continue
+            if not response.ok:
+                # Sending the same payload again would be rejected again, so drop it
+                print(f'Discord rejected {len(embeds)} notifications ({response.status_code}): {response.text[:200]}')
+                return True
+            if response.headers.get('X-RateLimit-Remaining') == '0':
+                time.sleep(float(response.headers.get('X-RateLimit-Reset-After', 0)))
+            return True
+        print(f'Discord notifications still queued after 5 attempts: {len(embeds)}')
+        return False
@@ -0,0 +1,67 @@
+import json
+
+VIDEO_ENCODERS = {'h264': 'libx264', 'hevc': 'libx265', 'av1': 'libsvtav1'}
+COPY_AUDIO_CODECS = ('aac', '')
+
+
+class EncodeProfile:
+    """A named ffmpeg recipe. A max_bitrate_kbps or max_height of 0 means no ceiling.
+
+    Sources in one of copy_codecs that are already under both ceilings are remuxed
+    instead of re-encoded.
+    """
+
+    __slots__ = ('name', 'video_codec', 'crf', 'max_bitrate_kbps', 'max_height', 'audio_bitrate_kbps', 'preset', 'copy_codecs')
+
+    def __init__(self, name: str, video_codec: str = 'h264', crf: int = 23, max_bitrate_kbps: int = 0, max_height: int = 0,
+                 audio_bitrate_kbps: int = 128, preset: str = 'fast', copy_codecs: list[str] | None = None):
+        if video_codec not in VIDEO_ENCODERS:
+            raise ValueError(f'Unsupported codec {video_codec} in encode profile {name}')
+        self.name = name
+        self.video_codec = video_codec
+        self.crf = crf
+        self.max_bitrate_kbps = max_bitrate_kbps
+        self.max_height = max_height
+        self.audio_bitrate_kbps = audio_bitrate_kbps
+        self.preset = str(preset)
+        self.copy_codecs = tuple(copy_codecs or (video_codec,))
+
+    def can_copy(self, probe: dict) -> bool:
+        if probe['video_codec'] not in self.copy_codecs or probe['audio_codec'] not in COPY_AUDIO_CODECS:
+            return False
+        if self.max_height and probe['height'] > self.max_height:
+            return False
+        return not self.max_bitrate_kbps or probe['bit_rate'] <= (self.max_bitrate_kbps + self.audio_bitrate_kbps) * 1000
+
+    def ffmpeg_args(self, probe: dict, threads: int = 0) -> list[str]:
+        args = ['-c:v', VIDEO_ENCODERS[self.video_codec], '-preset', self.preset, '-crf', str(self.crf)]
+        if self.max_bitrate_kbps:
+            args += ['-maxrate', f'{self.max_bitrate_kbps}k', '-bufsize', f'{self.max_bitrate_kbps * 2}k']
+        if self.max_height and probe['height'] > self.max_height:
+            args += ['-vf', f'scale=-2:{self.max_height}']
+        if self.video_codec == 'hevc':
+            # Without the hvc1 tag QuickTime and Drive's previewer refuse to play HEVC in MP4
+            args += ['-tag:v', 'hvc1']
+        args += ['-c:a', 'aac', '-b:a', f'{self.audio_bitrate_kbps}k']
+        if threads:
+            args += ['-threads', str(threads)]
+        return args
+
+
+ENCODE_PROFILES = {
+    # What every video got before profiles existed
+    'default': EncodeProfile('default'),
+    'compact': EncodeProfile('compact', crf=26, max_bitrate_kbps=2500, max_height=1080, audio_bitrate_kbps=96, preset='medium', copy_codecs=['h264', 'hevc', 'av1']),
+    'hevc': EncodeProfile('hevc', 'hevc', crf=28, max_bitrate_kbps=2000, max_height=1080, audio_bitrate_kbps=96, preset='medium', copy_codecs=['h264', 'hevc', 'av1']),
+    'av1': EncodeProfile('av1', 'av1', crf=35, max_bitrate_kbps=1500, max_height=1080, audio_bitrate_kbps=96, preset='8', copy_codecs=['hevc', 'av1']),
+}
+
+
+def load_encode_profiles(path: str | None) -> dict[str, EncodeProfile]:
+    """The built-in profiles, plus or overridden by those in a JSON file of {name: {field: value}}."""
+    profiles = dict(ENCODE_PROFILES)
+    if path:
+        with open(path, encoding='utf-8') as f:
+            for name, fields in json.load(f).items():
+                profiles[name] = EncodeProfile(name, **fields)
+    return profiles
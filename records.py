@@ -0,0 +1,120 @@
+INDEX_HEADERS = ['Key', 'Handle', 'Archive Videos', 'Video Drive ID', 'Thumbnail Drive ID', 'Channel ID', 'Title', 'Created', 'Description', 'Country', 'Keywords', 'Icon', 'Banner', 'Uploads ID', 'Encode Profile']
+VIDEO_HEADERS = ['YouTube ID', 'YouTube Link', 'Internal ID', 'Status', 'Title', 'Publish Date', 'Duration', 'Description', 'Ad Timestamps', 'Thumbnail', 'Tags', 'Views', 'Likes', 'Comments']
+
+# Attribute for each sheet column. YouTube Link is not stored, it is derived from the ID.
+CREATOR_FIELDS = {
+    'Key': 'key',
+    'Handle': 'handle',
+    'Archive Videos': 'archive_videos',
+    'Video Drive ID': 'video_drive_id',
+    'Thumbnail Drive ID': 'thumbnail_drive_id',
+    'Channel ID': 'channel_id',
+    'Title': 'title',
+    'Created': 'created',
+    'Description': 'description',
+    'Country': 'country',
+    'Keywords': 'keywords',
+    'Icon': 'icon',
+    'Banner': 'banner',
+    'Uploads ID': 'uploads_id',
+    'Encode Profile': 'encode_profile',
+}
+VIDEO_FIELDS = {
+    'YouTube ID': 'yt_id',
+    'Internal ID': 'internal_id',
+    'Status': 'status',
+    'Title': 'title',
+    'Publish Date': 'publish_date',
+    'Duration': 'duration',
+    'Description': 'description',
+    'Ad Timestamps': 'ad_timestamps',
+    'Thumbnail': 'thumbnail',
+    'Tags': 'tags',
+    'Views': 'views',
+    'Likes': 'likes',
+    'Comments': 'comments',
+}
+
+
+class CreatorRecord:
+    """One row of the Index sheet. Blank cells are None."""
+
+    __slots__ = tuple(CREATOR_FIELDS.values())
+    key: str
+    handle: str | None
+    archive_videos: bool
+    video_drive_id: str | None
+    thumbnail_drive_id: str | None
+    channel_id: str | None
+    title: str | None
+    created: str | None
+    description: str | None
+    country: str | None
+    keywords: str | None
+    icon: str | None
+    banner: str | None
+    uploads_id: str | None
+    encode_profile: str | None
+
+    def __init__(self, key: str, archive_videos: bool = True, **fields):
+        self.key = key
+        self.archive_videos = archive_videos
+        for name in self.__slots__:
+            if name not in ('key', 'archive_videos'):
+                setattr(self, name, fields.pop(name, None))
+        if fields:
+            raise TypeError(f"Unknown creator fields: {', '.join(fields)}")
+
+    @classmethod
+    def from_sheet(cls, record: dict) -> 'CreatorRecord':
+        creator = cls(record['Key'], str(record.get('Archive Videos', '')).upper() == 'TRUE')
+        for header, name in CREATOR_FIELDS.items():
+            if name not in ('key', 'archive_videos'):
+                setattr(creator, name, record.get(header) or None)
+        return creator
+
+    def to_row(self) -> list:
+        return [getattr(self, name) for name in self.__slots__]
+
+
+class VideoRecord:
+    """One row of a creator worksheet. Blank cells are ''; Duration is in seconds, or 'N/A' when YouTube has none."""
+
+    __slots__ = tuple(VIDEO_FIELDS.values())
+    yt_id: str
+    internal_id: str
+    status: str
+    title: str
+    publish_date: str
+    duration: int | str
+    description: str
+    ad_timestamps: str
+    thumbnail: str
+    tags: str
+    views: int | str
+    likes: int | str
+    comments: int | str
+
+    def __init__(self, yt_id: str, **fields):
+        self.yt_id = yt_id
+        for name in self.__slots__[1:]:
+            setattr(self, name, fields.pop(name, ''))
+        if fields:
+            raise TypeError(f"Unknown video fields: {', '.join(fields)}")
+
+    @property
+    def link(self) -> str:
+        return f'https://www.youtube.com/watch?v={self.yt_id}'
+
+    @classmethod
+    def from_sheet(cls, record: dict) -> 'VideoRecord':
+        """Build a record from a get_all_records() dict; columns it lacks are left blank."""
+        video = cls(record.get('YouTube ID', ''))
+        for header, name in VIDEO_FIELDS.items():
+            value = record.get(header)
+            if value is not None:
+                setattr(video, name, value)
+        return video
+
+    def to_row(self) -> list:
+        return [self.yt_id, self.link] + [getattr(self, name) for name in self.__slots__[1:]]
@@ -4,6 +4,7 @@ mkdir -p credentials
 mkdir -p downloaded
 mkdir -p encoded
 mkdir -p thumbnails
+mkdir -p state
 
 CURRENT_DIR=$(cygpath -w "$(pwd)" | sed 's/\\/\//g')
 
@@ -14,4 +15,5 @@ docker run --rm \
   -v "${CURRENT_DIR}/downloaded:/app/downloaded" \
   -v "${CURRENT_DIR}/encoded:/app/encoded" \
   -v "${CURRENT_DIR}/thumbnails:/app/thumbnails" \
+  -v "${CURRENT_DIR}/state:/app/state" \
   youtube-mirror
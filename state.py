@@ -0,0 +1,101 @@
+import json
+import os
+import sqlite3
+import threading
+
+
+class StateStore:
+    """Local SQLite database holding the creator index, per-video records and small caches.
+
+    Records are stored as JSON objects keyed by sheet column name, in the same shape
+    `gspread.Worksheet.get_all_records()` returns, so callers can switch between the
+    two sources without converting.
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        with self.conn:
+            self.conn.executescript('''
+                CREATE TABLE IF NOT EXISTS creators (
+                    key TEXT PRIMARY KEY,
+                    position INTEGER NOT NULL,
+                    data TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS videos (
+                    creator TEXT NOT NULL,
+                    yt_id TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (creator, yt_id)
+                );
+                CREATE TABLE IF NOT EXISTS mirrored_rows (
+                    sheet TEXT NOT NULL,
+                    row INTEGER NOT NULL,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (sheet, row)
+                );
+                CREATE TABLE IF NOT EXISTS kv (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                );
+            ''')
+
+    def get(self, namespace: str, key: str, default=None):
+        with self.lock:
+            row = self.conn.execute('SELECT value FROM kv WHERE namespace = ? AND key = ?', (namespace, key)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set(self, namespace: str, key: str, value):
+        with self.lock, self.conn:
+            self.conn.execute('INSERT OR REPLACE INTO kv (namespace, key, value) VALUES (?, ?, ?)', (namespace, key, json.dumps(value)))
+
+    def delete(self, namespace: str, key: str):
+        with self.lock, self.conn:
+            self.conn.execute('DELETE FROM kv WHERE namespace = ? AND key = ?', (namespace, key))
+
+    def items(self, namespace: str) -> dict:
+        with self.lock:
+            rows = self.conn.execute('SELECT key, value FROM kv WHERE namespace = ?', (namespace,)).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def get_creators(self) -> dict[str, dict]:
+        with self.lock:
+            rows = self.conn.execute('SELECT key, data FROM creators ORDER BY position').fetchall()
+        return {key: json.loads(data) for key, data in rows}
+
+    def set_creators(self, records: list[dict]):
+        with self.lock, self.conn:
+            self.conn.execute('DELETE FROM creators')
+            self.conn.executemany('INSERT INTO creators (key, position, data) VALUES (?, ?, ?)',
+                                  [(record['Key'], position, json.dumps(record)) for position, record in enumerate(records)])
+
+    def has_videos(self, creator: str) -> bool:
+        with self.lock:
+            return self.conn.execute('SELECT 1 FROM videos WHERE creator = ? LIMIT 1', (creator,)).fetchone() is not None
+
+    def get_videos(self, creator: str) -> list[dict]:
+        with self.lock:
+            rows = self.conn.execute('SELECT data FROM videos WHERE creator = ? ORDER BY position', (creator,)).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def set_videos(self, creator: str, records: list[dict]):
+        with self.lock, self.conn:
+            self.conn.execute('DELETE FROM videos WHERE creator = ?', (creator,))
+            self.conn.executemany('INSERT OR REPLACE INTO videos (creator, yt_id, position, data) VALUES (?, ?, ?, ?)',
+                                  [(creator, record['YouTube ID'], position, json.dumps(record)) for position, record in enumerate(records)])
+
+    def get_mirror(self, sheet: str) -> list[list[str]] | None:
+        with self.lock:
+            rows = self.conn.execute('SELECT data FROM mirrored_rows WHERE sheet = ? ORDER BY row', (sheet,)).fetchall()
+        return [json.loads(data) for (data,) in rows] if rows else None
+
+    def set_mirror(self, sheet: str, rows: list[list[str]]):
+        with self.lock, self.conn:
+            self.conn.execute('DELETE FROM mirrored_rows WHERE sheet = ?', (sheet,))
+            self.conn.executemany('INSERT INTO mirrored_rows (sheet, row, data) VALUES (?, ?, ?)',
+                                  [(sheet, i, json.dumps(row)) for i, row in enumerate(rows)])
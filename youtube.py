@@ -0,0 +1,126 @@
+import asyncio
+import threading
+
+import aiohttp
+
+from governor import RateGovernor
+from metrics import Metrics
+
+API_URL = 'https://www.googleapis.com/youtube/v3'
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+CHANNEL_FIELDS = 'items(snippet(publishedAt,thumbnails),brandingSettings(channel(title,description,keywords,country),image),contentDetails/relatedPlaylists/uploads)'
+PLAYLIST_FIELDS = 'etag,nextPageToken,items/contentDetails/videoId'
+STATS_FIELDS = 'items(id,statistics(viewCount,likeCount,commentCount))'
+VIDEO_FIELDS = 'items(id,snippet(title,publishedAt,description,tags,thumbnails(maxres/url,standard/url,high/url)),contentDetails/duration,statistics(viewCount,likeCount,commentCount))'
+
+
+class YouTubeClient:
+    """Async YouTube Data API client sharing one aiohttp connection pool.
+
+    The client runs its own event loop on a background thread, so blocking code on
+    any thread can call `run()` while every request shares the same pool, the
+    governor's quota bucket and the quota counters.
+    """
+
+    def __init__(self, api_key: str, governor: RateGovernor, metrics: Metrics, max_connections: int = 20):
+        self.api_key = api_key
+        self.governor = governor
+        self.metrics = metrics
+        self.max_connections = max_connections
+        self.quota_used = 0
+        self.calls: dict[str, int] = {}
+        self.session = None
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='youtube-client', daemon=True)
+        self.thread.start()
+
+    def run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def close(self):
+        """Close the connection pool and stop the loop thread; the client can't be used afterwards."""
+        if self.session is not None:
+            self.run(self.session.close())
+            self.session = None
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+    async def get(self, resource: str, params: dict, etag: str | None = None, units: int = 1) -> dict | None:
+        """GET one API resource, returning None when `etag` still matches."""
+        if self.session is None:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(total=60)
+            )
+        headers = {'If-None-Match': etag} if etag else {}
+        for attempt in range(5):
+            await asyncio.to_thread(self.governor.acquire, 'youtube', units)
+            self.quota_used += units
+            self.calls[resource] = self.calls.get(resource, 0) + 1
+            self.metrics.inc('api_requests_total', upstream='youtube', resource=resource)
+            self.metrics.inc('quota_units_total', units, upstream='youtube')
+            try:
+                async with self.session.get(f'{API_URL}/{resource}', params={**params, 'key': self.api_key}, headers=headers) as response:
+                    if response.status == 304:
+                        return None
+                    if response.status in RETRY_STATUSES and attempt < 4:
+                        self.metrics.inc('retries_total', upstream='youtube', status=response.status)
+                        await asyncio.sleep(2 ** attempt)
+                        continue
+                    response.raise_for_status()
+                    return await response.json()
+            except aiohttp.ClientResponseError:
+                raise
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                # Connection resets, DNS failures and timeouts get the same backoff as 5xx answers
+                if attempt == 4:
+                    raise
+                self.metrics.inc('retries_total', upstream='youtube', reason=type(e).__name__)
+                await asyncio.sleep(2 ** attempt)
+
+    async def get_channel_id(self, channel_handle: str) -> str:
+        data = await self.get('channels', {'part': 'id', 'forHandle': channel_handle.lstrip('@'), 'fields': 'items/id'})
+        if not data.get('items'):
+            raise ValueError(f'Channel not found: {channel_handle}')
+        return data['items'][0]['id']
+
+    async def get_channel(self, channel_id: str) -> dict:
+        data = await self.get('channels', {'part': 'snippet,brandingSettings,contentDetails', 'id': channel_id, 'fields': CHANNEL_FIELDS})
+        return data['items'][0]
+
+    async def get_video_ids(self, uploads_playlist_id: str, stop_ids: set[str] | None = None, etag: str | None = None) -> tuple[list[str] | None, str | None]:
+        """Page through an uploads playlist (newest first), stopping before any ID in stop_ids.
+
+        Returns (video_ids, etag). video_ids is None when the playlist still matches etag.
+        """
+        video_ids = []
+        next_page_token = None
+        first_etag = None
+        while True:
+            params = {'part': 'contentDetails', 'maxResults': 50, 'playlistId': uploads_playlist_id, 'fields': PLAYLIST_FIELDS}
+            if next_page_token:
+                params['pageToken'] = next_page_token
+            data = await self.get('playlistItems', params, None if next_page_token else etag)
+            if data is None:
+                return None, etag
+            if not first_etag:
+                first_etag = data.get('etag')
+            for item in data.get('items', []):
+                video_id = item['contentDetails']['videoId']
+                if stop_ids and video_id in stop_ids:
+                    return video_ids, first_etag
+                video_ids.append(video_id)
+            next_page_token = data.get('nextPageToken')
+            if not next_page_token:
+                break
+        return video_ids, first_etag
+
+    async def get_videos(self, video_ids: list[str], part: str = 'snippet,contentDetails,statistics', fields: str = VIDEO_FIELDS) -> dict[str, dict]:
+        # All 50-ID chunks are requested at once; the connection pool and governor bound the fan-out
+        chunks = [video_ids[i:i + 50] for i in range(0, len(video_ids), 50)]
+        pages = await asyncio.gather(*[self.get('videos', {'part': part, 'id': ','.join(chunk), 'fields': fields}) for chunk in chunks])
+        output = {}
+        for page in pages:
+            for item in page.get('items', []):
+                output[item.pop('id')] = item
+        return output